@@ -0,0 +1,73 @@
+import chat_transcript
+
+
+class Agent:
+    # A named agent of one session: its PDFs, the lease on the shared engine
+    # built from them, its conversation and its training job
+    def __init__(self, name, pdf_files, page_size, builtin=False):
+        self.name = name
+        self.pdf_files = pdf_files
+        # bumped when the file list changes, so the sidebar widgets editing it start over
+        self.files_version = 0
+        self.builtin = builtin
+        self.page_size = page_size
+        self.engine_lease = None
+        self.training_job = None
+        self.training_notes = []
+        self.reset_conversation(None)
+
+    @property
+    def trained(self):
+        return self.engine_lease is not None
+
+    def set_files(self, pdf_files):
+        self.pdf_files = pdf_files
+        self.files_version += 1
+
+    def reset_conversation(self, memory):
+        self.memory = memory
+        self.transcript = chat_transcript.ChatTranscript(self.page_size)
+        self.last_question = None
+        self.turn_usage = []
+
+    def release(self):
+        if self.engine_lease is not None:
+            self.engine_lease.release()
+            self.engine_lease = None
+
+
+class AgentManager:
+    # Agents of a session by name. Every agent keeps its engine lease and its
+    # memory, so switching agents is a lookup, not a retrain.
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.agents = {}
+        self.active = None
+
+    def add(self, name, pdf_files, builtin=False):
+        if name in self.agents:
+            raise ValueError(f"An agent called {name!r} already exists")
+        agent = Agent(name, pdf_files, self.page_size, builtin)
+        self.agents[name] = agent
+        if self.active is None:
+            self.active = name
+        return agent
+
+    def remove(self, name):
+        agent = self.agents.pop(name)
+        agent.release()
+        if self.active == name:
+            self.active = next(iter(self.agents), None)
+
+    def get(self, name):
+        return self.agents.get(name)
+
+    def names(self):
+        return list(self.agents)
+
+    @property
+    def active_agent(self):
+        return self.agents.get(self.active)
+
+    def training(self):
+        return [agent for agent in self.agents.values() if agent.training_job is not None]
@@ -0,0 +1,103 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    # "Who is Imanol Asolo?." and "who is imanol  asolo" share an entry
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text))
+
+
+# Words that do not change what a question asks for (English and Spanish)
+STOPWORDS = frozenset("""
+a an and are as at be can could did do does for from give has have he her his how i in is it me my of on or
+please she tell that the their them they this to was were what when where which who whom why will with you your
+about speak explain brief
+al como con cual cuales de del el en es la las lo los me mi por que quien se sobre su sus un una y
+""".split())
+
+
+def content_terms(normalized):
+    return frozenset(term for term in normalized.split() if term not in STOPWORDS)
+
+
+class AnswerCache:
+    # Process-wide cache of answers keyed by (corpus id, normalized question),
+    # with TTL and LRU eviction. When `embeddings` is given, a miss falls back
+    # to the most similar past question on the same corpus above `threshold`
+    # that asks about the same content words: "... with Python?" never gets
+    # the answer to "... with React?", however close their spelling.
+    def __init__(self, max_entries=1024, ttl=24 * 3600, embeddings=None, threshold=0.92):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, corpus_id, question):
+        key = (corpus_id, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+            if self.embeddings is None:
+                self.misses += 1
+                return None
+            terms = content_terms(key[1])
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == corpus_id and e["terms"] == terms]
+
+        if candidates:
+            query = np.asarray(self.embeddings.embed_query(key[1]), dtype=np.float32)
+            scores = np.stack([e["vector"] for _, e in candidates]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                with self._lock:
+                    if candidates[best][0] in self._entries:
+                        self._entries.move_to_end(candidates[best][0])
+                    self.similar_hits += 1
+                return candidates[best][1]["answer"]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, corpus_id, question, answer):
+        normalized = normalize_question(question)
+        vector = None
+        if self.embeddings is not None:
+            vector = np.asarray(self.embeddings.embed_query(normalized), dtype=np.float32)
+        with self._lock:
+            key = (corpus_id, normalized)
+            self._entries[key] = {"answer": answer, "vector": vector, "terms": content_terms(normalized), "expires": time.monotonic() + self.ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            }
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if entry["expires"] <= now]
+        for key in expired:
+            del self._entries[key]
@@ -1,60 +1,151 @@
 import streamlit as st
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain.chat_models import ChatOpenAI 
-from htmlTemplates import css, bot_template, user_template
+from htmlTemplates import css
+import agents
+import chat_transcript
+import lazy_imports
+from metrics import METRICS
+import settings
 import os
+import time
 
-def get_pdf_text(pdf_list):
-    text = ""
-    for pdf in pdf_list:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
-
-def get_text_chunks(text):
-    text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-    )
-    chunks = text_splitter.split_text(text)
-    return chunks
-
-def get_vector_store(text_chunks):
-    if not text_chunks:
-        st.warning("Please upload the textual PDF file - this is PDF files of image")
-        return None
-    embeddings = OpenAIEmbeddings(openai_api_key=st.secrets["OPEN_AI_APIKEY"])
-    vectorstore = FAISS.from_texts(texts=text_chunks, embedding=embeddings)
-    return vectorstore
-
-def get_conversation_chain(vector_store):
-    llm = ChatOpenAI(openai_api_key=st.secrets["OPEN_AI_APIKEY"])
-    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-    conversation_chain = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=vector_store.as_retriever(),
-        memory=memory
-    )
-    return conversation_chain
-
-def handle_userInput(user_question):
-    response = st.session_state.conversation({'question': user_question})
-    st.session_state.chat_history = response['chat_history']
-
-    for i, msg in enumerate(st.session_state.chat_history):
-        if i % 2 == 0:
-            st.write(user_template.replace("{{MSG}}", msg.content), unsafe_allow_html=True)
+SUGGESTED_QUESTIONS = [
+    "Who is Imanol Asolo?.",
+    "Speak about Imanol Asolo´s skills.",
+    "Give me a brief explanation about projects of Imanol Asolo.",
+    "How can I contact with Imanol Asolo?",
+]
+
+IMANOL_BOT = "Imanol Asolo Bot"
+NEW_AGENT = "+ New agent"
+
+def load_rag_pipeline():
+    # langchain, FAISS, PyPDF2 and OpenAI are only imported on first use
+    return lazy_imports.timed_import("rag_pipeline")
+
+def handle_userInput(agent, user_question):
+    rag = load_rag_pipeline()
+    engine = agent.engine_lease.engine
+    memory = agent.memory
+    standalone = rag.is_standalone_question(user_question, memory, SUGGESTED_QUESTIONS)
+
+    # history and the new question go out first, the answer fills its own placeholder
+    transcript = agent.transcript
+    render_transcript(transcript)
+    st.write(chat_transcript.render_message("user", user_question), unsafe_allow_html=True)
+    placeholder = st.empty()
+
+    answer, usage = rag.answer_question(engine, memory, user_question, placeholder, standalone)
+    placeholder.write(chat_transcript.render_message("bot", answer), unsafe_allow_html=True)
+    agent.turn_usage.append(usage)
+    transcript.append("user", user_question)
+    transcript.append("bot", answer)
+
+def render_transcript(transcript):
+    if transcript.hidden_count():
+        st.button(f"Show earlier messages ({transcript.hidden_count()} hidden)", on_click=transcript.show_more)
+    # one element for the whole page of cached HTML instead of one per message
+    st.write(transcript.visible_html(), unsafe_allow_html=True)
+
+def render_turn_usage(agent):
+    if not agent.turn_usage:
+        return
+    usage = agent.turn_usage[-1]
+    source = "answer cache" if usage["cached"] else f"{usage['prompt_tokens']} prompt / {usage['completion_tokens']} completion tokens"
+    st.caption(f"Last turn: {usage['history_tokens']} history tokens ({settings.MEMORY_STRATEGY} memory), {source}")
+
+def start_training(agent):
+    rag = load_rag_pipeline()
+    # the agent is built on a background thread, this session keeps running
+    agent.training_job = rag.start_training(agent.pdf_files, agent.engine_lease)
+    agent.training_notes = []
+
+def collect_training(agent):
+    # the background job is done: attach the agent to the engine it built
+    rag = load_rag_pipeline()
+    job = agent.training_job
+    agent.training_notes = list(job.notes)
+    if job.result is not None:
+        retrained = agent.trained
+        agent.engine_lease = rag.finish_training(job, agent.engine_lease)
+        # a retrained agent keeps talking with the same conversation
+        if not retrained:
+            agent.reset_conversation(rag.get_memory())
+    # a failed retrain leaves the agent on its previous engine and conversation
+    if job.error is not None:
+        agent.training_notes.append(("error", f"Training failed: {job.error}"))
+    agent.training_job = None
+
+def create_agent():
+    # on_click of "Create and train": runs before the rerun, so the agent
+    # selectbox can be switched to the new agent
+    manager = st.session_state.agents
+    name = st.session_state.new_agent_name.strip()
+    pdf_files = st.session_state.new_agent_files
+    if not name or name == NEW_AGENT or manager.get(name) is not None:
+        st.session_state.agent_error = "Choose a new, unique name for the agent."
+        return
+    if not pdf_files:
+        st.session_state.agent_error = "Upload at least one PDF file."
+        return
+    agent = manager.add(name, list(pdf_files))
+    start_training(agent)
+    manager.active = name
+    st.session_state.agent_choice = name
+    st.session_state.agent_error = None
+
+def retrain_agent(name):
+    # on_click of "Retrain": the kept files plus the new uploads become the
+    # agent's corpus; its current index is the base, so only new PDFs are embedded
+    agent = st.session_state.agents.get(name)
+    kept = st.session_state[f"keep-files-{name}-{agent.files_version}"]
+    added = st.session_state[f"add-files-{name}-{agent.files_version}"] or []
+    if not kept and not added:
+        st.session_state.agent_error = "An agent needs at least one PDF file."
+        return
+    agent.set_files([agent.pdf_files[i] for i in kept] + list(added))
+    start_training(agent)
+    st.session_state.agent_error = None
+
+def delete_agent(name):
+    manager = st.session_state.agents
+    agent = manager.get(name)
+    if agent.training_job is not None:
+        load_rag_pipeline().abandon_training(agent.training_job)
+    manager.remove(name)
+    st.session_state.agent_choice = manager.active
+
+def render_training(job):
+    for stage in job.snapshot():
+        if stage["finished"]:
+            st.caption(f":white_check_mark: {stage['name']} ({stage['elapsed']:.1f}s)")
+            continue
+        progress = f"{stage['done']}/{stage['total']}" if stage["total"] else f"{stage['done']}"
+        eta = f", about {stage['eta']:.0f}s left" if stage["eta"] is not None else ""
+        text = f"{stage['name']}: {progress}{eta}"
+        if stage["fraction"] is not None:
+            st.progress(stage["fraction"], text=text)
         else:
-            st.write(bot_template.replace("{{MSG}}", msg.content), unsafe_allow_html=True)
+            st.caption(text)
+
+def render_training_notes(agent):
+    for level, message in agent.training_notes:
+        getattr(st, level if level in ("warning", "error") else "caption")(message)
+
+def render_debug_panel():
+    summary = METRICS.summary()
+    with st.expander(":stopwatch: Debug: pipeline metrics"):
+        rows = [
+            {"span": name, "count": span["count"], "p50 ms": span["p50"] * 1000, "p95 ms": span["p95"] * 1000, "max ms": span["max"] * 1000}
+            for name, span in sorted(summary["spans"].items())
+        ]
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        for name, value in sorted({**summary["counters"], **summary["gauges"]}.items()):
+            st.caption(f"{name}: {value:,.2f}" if isinstance(value, float) else f"{name}: {value:,}")
+        for name, seconds in lazy_imports.IMPORT_TIMES.items():
+            st.caption(f"import {name}: {seconds:.2f}s")
+        st.download_button("Download metrics.prom", METRICS.prometheus_text(), file_name="metrics.prom")
 
 def main():
     load_dotenv()
@@ -62,16 +153,19 @@ def main():
     st.set_page_config(page_title="Imanol Asolo AI Agents handler", page_icon=":scroll:")
     st.write(css, unsafe_allow_html=True)
 
-    if "conversation" not in st.session_state:
-        st.session_state.conversation = None
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = None
-
-    if "train" not in st.session_state:
-        st.session_state.train = False
+    if "agents" not in st.session_state:
+        # every session starts with the Imanol bot; trained agents keep their
+        # engine and conversation while the user switches between them
+        manager = agents.AgentManager(settings.CHAT_PAGE_SIZE)
+        manager.add(IMANOL_BOT, [os.path.join(os.getcwd(), "imanolpdf1.pdf")], builtin=True)
+        st.session_state.agents = manager
+    if "agent_error" not in st.session_state:
+        st.session_state.agent_error = None
+    manager = st.session_state.agents
 
-    if "pdf_text" not in st.session_state:
-        st.session_state.pdf_text = ""
+    for agent in manager.training():
+        if agent.training_job.done():
+            collect_training(agent)
 
     st.header("Multi-Agents :books: - Chat handler :robot_face:")
 
@@ -81,9 +175,11 @@ def main():
         with st.expander("Expand instructions"):
             # Lista de instrucciones
             instrucciones = [
-                "1. Choose betwen using Imanol Asolo bot or an agent created by yourself.",
+                "1. Choose the Imanol Asolo bot or create an agent from your own PDFs.",
                 "2. Push Train agent button.",
-                "3. Start talking with agent at your own."
+                "3. Start talking with agent at your own.",
+                "4. Add or remove PDFs of your agents and retrain them: only the changed files are indexed again.",
+                "5. Switch between your trained agents at any time, they keep their conversation."
             ]
 
             # Renderizar la lista de instrucciones
@@ -92,52 +188,75 @@ def main():
 
       
 
-        st.subheader(":file_folder: PDF File's Section")
-        
-        use_sample_pdf = st.checkbox("Talk with Imanol Asolo Bot")
-        if use_sample_pdf:
-            sample_pdf_path = os.path.join(os.getcwd(), "imanolpdf1.pdf")
-            st.session_state.pdf_files = [sample_pdf_path]
+        st.subheader(":robot_face: Agents")
+
+        choice = st.selectbox("Agent", manager.names() + [NEW_AGENT], key="agent_choice")
+        agent = None
+        if choice == NEW_AGENT:
+            st.text_input("Agent name", key="new_agent_name")
+            st.file_uploader("Talk with your own trained agents", type=['pdf'], accept_multiple_files=True, key="new_agent_files")
+            st.button("Create and train", on_click=create_agent)
+            if st.session_state.agent_error:
+                st.warning(st.session_state.agent_error)
         else:
-            st.session_state.pdf_files = st.file_uploader("Talk with your own trained agents", type=['pdf'], accept_multiple_files=True)
-
-        #st.session_state.api_key = st.text_input("Enter your OpenAI API key:")
-        train = st.button("Train the Agent")
-        if train:
-            with st.spinner("Processing"):
-                # get the text from PDFs
-                raw_text = get_pdf_text(st.session_state.pdf_files)
-                st.session_state.pdf_text = raw_text
-                # get the text chunks
-                text_chunks = get_text_chunks(raw_text)
-                # create vector store
-                vector_store = get_vector_store(text_chunks)
-                # conversation chain
-                st.session_state.conversation = get_conversation_chain(vector_store)
-                # set train to True to indicate agent has been trained
-                st.session_state.train = True
+            # switching only changes the active agent: no retraining
+            manager.active = choice
+            agent = manager.active_agent
+            file_names = [os.path.basename(getattr(pdf, "name", pdf)) for pdf in agent.pdf_files]
+            #st.session_state.api_key = st.text_input("Enter your OpenAI API key:")
+            if agent.trained and not agent.builtin:
+                # retraining needs a changed file list: only the difference is re-indexed
+                version = agent.files_version
+                kept = st.multiselect("PDF files", list(range(len(file_names))), default=list(range(len(file_names))), format_func=file_names.__getitem__, key=f"keep-files-{agent.name}-{version}")
+                added = st.file_uploader("Add PDF files", type=['pdf'], accept_multiple_files=True, key=f"add-files-{agent.name}-{version}")
+                changed = bool(added) or len(kept) != len(file_names)
+                st.button("Retrain the Agent", on_click=retrain_agent, args=(agent.name,), disabled=agent.training_job is not None or not changed)
+                if st.session_state.agent_error:
+                    st.warning(st.session_state.agent_error)
+            else:
+                st.caption(f"{len(file_names)} PDF file(s): " + ", ".join(file_names))
+                if not agent.trained:
+                    train = st.button("Train the Agent", disabled=agent.training_job is not None)
+                    if train:
+                        start_training(agent)
+                        if "rag_pipeline" in lazy_imports.IMPORT_TIMES:
+                            st.caption(f"RAG stack imported in {lazy_imports.IMPORT_TIMES['rag_pipeline']:.2f}s")
+            if agent.training_job is not None:
+                render_training(agent.training_job)
+            render_training_notes(agent)
+            if not agent.builtin:
+                st.button("Delete agent", on_click=delete_agent, args=(agent.name,))
+        if settings.DEBUG_PANEL:
+            render_debug_panel()
         st.subheader(":question: Questions that you can ask to the agent")
         with st.expander("Expand questions"):
-            # Lista de instrucciones
-            instrucciones = [
-                "1. Who is Imanol Asolo?.",
-                "2. Speak about Imanol Asolo´s skills.",
-                "3. Give me a brief explanation about projects of Imanol Asolo.",
-                "4. How can I contact with Imanol Asolo?"
-            ]
+            # Renderizar la lista de preguntas
+            for i, pregunta in enumerate(SUGGESTED_QUESTIONS, start=1):
+                st.markdown(f"{i}. {pregunta}")
 
-            # Renderizar la lista de instrucciones
-            for instruccion in instrucciones:
-                st.markdown(instruccion)
-
-    if not st.session_state.train:
+    if agent is None:
+        st.info("Name your agent, upload its PDFs and push Create and train.")
+    elif not agent.trained and agent.training_job is None:
         st.warning("First Train the Agent")
+    elif not agent.trained:
+        st.info("Training the agent...")
 
-    if st.session_state.train:
+    if agent is not None and agent.trained:
         st.write("<h5><br>Ask anything from your documents, doesn´t matter the language I am multi-idiomatic !:</h5>", unsafe_allow_html=True)
-        user_question = st.text_input(label="", placeholder="Enter something...")
-        if user_question:
-            handle_userInput(user_question)
+        # one input per agent, so a question is not resent to the next agent
+        user_question = st.text_input(label="", placeholder="Enter something...", key=f"question-{agent.name}")
+        # reruns keep the input's value; only a new question goes to the agent
+        if user_question and user_question != agent.last_question:
+            agent.last_question = user_question
+            handle_userInput(agent, user_question)
+        else:
+            render_transcript(agent.transcript)
+        render_turn_usage(agent)
+
+    # poll the background jobs until they are done
+    if manager.training():
+        time.sleep(settings.TRAINING_POLL_SECONDS)
+        st.experimental_rerun()
 
 if __name__ == "__main__":
     main()
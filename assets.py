@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image, features
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+THUMBNAIL_DIR = os.path.join(BASE_DIR, ".thumbnails")
+THUMBNAIL_MANIFEST = "manifest.json"
+# Thumbnails are rendered at twice the display width so they stay sharp on HiDPI screens
+THUMBNAIL_SCALE = 2
+
+
+class AssetRegistry:
+    # Process-wide cache of static files: each file is read once and only read
+    # again when its mtime or size changes on disk
+    def __init__(self, base_dir=BASE_DIR, thumbnail_dir=THUMBNAIL_DIR):
+        self.base_dir = base_dir
+        self.thumbnail_dir = thumbnail_dir
+        self._cache = {}
+        self._thumbnails = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.base_dir, name)
+
+    def read(self, name):
+        path = self.path(name)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        with open(path, "rb") as file:
+            data = file.read()
+        with self._lock:
+            self._cache[name] = (version, data)
+        return data
+
+    def cached_bytes(self):
+        with self._lock:
+            return sum(len(data) for _, data in self._cache.values())
+
+    def build_thumbnails(self, images):
+        # images: iterable of (file name, display width)
+        for name, width in images:
+            self.thumbnail(name, width)
+
+    def thumbnail(self, name, width):
+        # Path of a copy of the image resized for `width`; generated files are
+        # recorded in a manifest keyed by source hash, so they survive restarts
+        # and are rebuilt only when the source image changes
+        path = self.path(name)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._thumbnails.get((name, width))
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            with open(path, "rb") as file:
+                digest = hashlib.sha256(file.read()).hexdigest()
+            manifest = self._load_manifest()
+            entry = f"{digest}:{width}"
+            thumbnail_name = manifest.get(entry)
+            if thumbnail_name is None or not os.path.exists(os.path.join(self.thumbnail_dir, thumbnail_name)):
+                thumbnail_name = self._render_thumbnail(path, digest, width)
+                if thumbnail_name is None:
+                    return path
+                manifest[entry] = thumbnail_name
+                self._save_manifest(manifest)
+            thumbnail_path = os.path.join(self.thumbnail_dir, thumbnail_name)
+            self._thumbnails[(name, width)] = (version, thumbnail_path)
+            return thumbnail_path
+
+    def _render_thumbnail(self, path, digest, width):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        image_format = "WEBP" if features.check("webp") else "PNG"
+        thumbnail_name = f"{stem}-{digest[:12]}-{width}.{image_format.lower()}"
+        try:
+            with Image.open(path) as image:
+                target_width = width * THUMBNAIL_SCALE
+                if image.width > target_width:
+                    height = max(1, round(image.height * target_width / image.width))
+                    image = image.resize((target_width, height), Image.LANCZOS)
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                os.makedirs(self.thumbnail_dir, exist_ok=True)
+                image.save(os.path.join(self.thumbnail_dir, thumbnail_name), image_format, quality=85, method=6)
+        except OSError:
+            return None
+        return thumbnail_name
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.thumbnail_dir, THUMBNAIL_MANIFEST)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        tmp_path = os.path.join(self.thumbnail_dir, f"{THUMBNAIL_MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, os.path.join(self.thumbnail_dir, THUMBNAIL_MANIFEST))
@@ -0,0 +1,36 @@
+"""Offline benchmark of the embedding scheduler against the fake backend.
+
+    python benchmarks/bench_embeddings.py --chunks 2000 --latency 0.2 --capacity 8
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_scheduler import FakeEmbeddingBackend, ScheduledEmbeddings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests before the fake server answers 429")
+    parser.add_argument("--batch-tokens", type=int, default=8000)
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    texts = [f"chunk {i} " + "lorem ipsum " * (args.chunk_chars // 12) for i in range(args.chunks)]
+    print(f"{args.chunks} chunks of ~{args.chunk_chars} chars, {args.latency}s per request, capacity {args.capacity}")
+    for in_flight in args.in_flight:
+        backend = FakeEmbeddingBackend(size=256, latency=args.latency, capacity=args.capacity)
+        embeddings = ScheduledEmbeddings(backend, max_batch_tokens=args.batch_tokens, max_in_flight=in_flight, base_delay=args.latency)
+        embeddings.embed_documents(texts)
+        stats = embeddings.last_stats.as_dict()
+        print(f"in_flight={in_flight:<3} {stats['seconds']:>7}s  {stats['texts_per_second']:>8} chunks/s  "
+              f"{stats['batches']} batches  {stats['retries']} retries  {backend.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Cold import time of the portfolio, the chat app and the RAG stack.
+
+Each module is imported in a fresh interpreter with ``-X importtime``, so the
+numbers include everything it pulls in.
+
+    python benchmarks/bench_imports.py
+"""
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["main", "app", "rag_pipeline"]
+
+
+def import_time(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    # last line of -X importtime is the module itself: "import time: self | cumulative | name"
+    for line in reversed(result.stderr.splitlines()):
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1e6, None
+    return None, "no importtime output"
+
+
+def main():
+    for module in MODULES:
+        seconds, error = import_time(module)
+        if error:
+            print(f"{module:<14} failed: {error}")
+        else:
+            print(f"{module:<14} {seconds:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
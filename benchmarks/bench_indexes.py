@@ -0,0 +1,61 @@
+"""Build time, size, search latency and recall@10 of each FAISS index type.
+
+Uses clustered random vectors (no embeddings, no network) so large corpora can
+be simulated; recall is measured against the exact flat search.
+
+    python benchmarks/bench_indexes.py --vectors 20000 100000 --dim 768
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+import faiss_indexes
+import settings
+
+
+def clustered_vectors(count, dimension, clusters, rng):
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, nargs="+", default=[20000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--types", nargs="+", default=list(faiss_indexes.INDEX_TYPES))
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for count in args.vectors:
+        vectors = clustered_vectors(count, args.dim, max(16, count // 500), rng)
+        queries = vectors[rng.integers(count, size=args.queries)] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(vectors)
+        _, expected = exact.search(queries, 10)
+        auto = faiss_indexes.choose_index_type(count, args.dim, settings.ENGINE_MEMORY_BUDGET_MB * 2**20, settings.INDEX_FLAT_MAX_VECTORS)
+        print(f"\n{count} vectors of {args.dim} dims, auto picks {auto} ({settings.ENGINE_MEMORY_BUDGET_MB} MiB budget)")
+        for kind in args.types:
+            started = time.perf_counter()
+            index = faiss_indexes.build_index(kind, vectors, args.nprobe, args.ef_search)
+            build_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            _, labels = index.search(queries, 10)
+            search_ms = (time.perf_counter() - started) * 1000 / args.queries
+            recall = np.mean([len(set(found) & set(true)) / 10 for found, true in zip(labels, expected)])
+            size = len(faiss.serialize_index(index))
+            print(f"  {kind:<5} build {build_seconds:7.2f} s  {size / 2**20:8.1f} MiB  "
+                  f"search {search_ms:6.3f} ms  recall@10 {recall:.2f}")
+
+
+if __name__ == "__main__":
+    main()
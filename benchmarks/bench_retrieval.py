@@ -0,0 +1,181 @@
+"""Speed and quality benchmark of the RAG pipeline over the bundled PDFs.
+
+Runs extraction, chunking, indexing and top-k retrieval with the local hashing
+embedder (no network), once per chunking configuration, and reports per-stage
+wall time, peak memory, index size and recall@k of dense and hybrid
+retrieval against benchmarks/questions.json.
+
+    python benchmarks/bench_retrieval.py --chunk-tokens 200 300 --overlaps 20 40
+    python benchmarks/bench_retrieval.py --min-recall 0.8   # non-zero exit on regression
+"""
+import argparse
+import json
+import os
+import sys
+import resource
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import faiss
+from PyPDF2.errors import PdfReadError
+
+import embedding_backends
+import pdf_extraction
+import rag_pipeline
+import retrieval_engine
+import settings
+
+PDFS = [
+    "imanolpdf1.pdf",
+    "pdfImanol.pdf",
+    "sample.pdf",
+    "Raptor_Eye_pres.pdf",
+    "AI_medicare_pres.pdf",
+    "Botarmy_pres.pdf",
+]
+QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json")
+
+
+def normalize(text):
+    return " ".join(text.split()).lower()
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Stage:
+    # Wall time of one pipeline stage and the process peak RSS once it is done.
+    # (tracemalloc would be more precise but slows PDF parsing down ~100x.)
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.results[self.name] = {"seconds": time.perf_counter() - self.started, "peak_rss_mb": peak_rss_mb()}
+
+
+def extract(pdf_paths):
+    pages, skipped = [], []
+    for path in pdf_paths:
+        try:
+            pages.extend(pdf_extraction.iter_pdf_pages([path]))
+        except PdfReadError as error:
+            skipped.append(f"{os.path.basename(path)} ({error})")
+    return pages, skipped
+
+
+def run(pdf_paths, questions, chunk_tokens, overlap, k_values, embedding_size):
+    settings.CHUNK_TOKENS = chunk_tokens
+    settings.CHUNK_OVERLAP_TOKENS = overlap
+    embeddings = embedding_backends.HashingEmbeddings(size=embedding_size)
+    stages = {}
+
+    with Stage(stages, "extract"):
+        pages, skipped = extract(pdf_paths)
+    with Stage(stages, "chunk"):
+        chunks = list(rag_pipeline.get_text_chunks(pages))
+    with Stage(stages, "index"):
+        store = None
+        for start in range(0, len(chunks), settings.INDEX_BATCH_SIZE):
+            store = rag_pipeline.add_to_vector_store(store, chunks[start:start + settings.INDEX_BATCH_SIZE], embeddings)
+
+    dense = lambda question: store.similarity_search(question, k=max(k_values))
+    hybrid = retrieval_engine.RetrievalEngine("bench", store).retriever
+    hybrid.k = max(k_values)
+    with Stage(stages, "retrieve"):
+        dense_recall, dense_latency = evaluate(dense, questions, k_values)
+    with Stage(stages, "retrieve_hybrid"):
+        hybrid_recall, hybrid_latency = evaluate(hybrid.get_relevant_documents, questions, k_values)
+
+    return {
+        "chunk_tokens": chunk_tokens,
+        "chunk_overlap_tokens": overlap,
+        "mean_chunk_tokens": sum(metadata["tokens"] for _, metadata in chunks) / len(chunks),
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "skipped": skipped,
+        "stages": stages,
+        "index_bytes": len(faiss.serialize_index(store.index)),
+        "dense": {"recall": dense_recall, **dense_latency},
+        "hybrid": {"recall": hybrid_recall, **hybrid_latency, "lexical_only": hybrid.lexical_only / len(questions)},
+    }
+
+
+def evaluate(search, questions, k_values):
+    hits = {k: 0 for k in k_values}
+    latencies = []
+    for item in questions:
+        started = time.perf_counter()
+        docs = search(item["question"])
+        latencies.append(time.perf_counter() - started)
+        expected = normalize(item["expected"])
+        for rank, doc in enumerate(docs, start=1):
+            if doc.metadata["source"] in item["sources"] and expected in normalize(doc.page_content):
+                for k in k_values:
+                    if rank <= k:
+                        hits[k] += 1
+                break
+    latencies.sort()
+    recall = {k: hits[k] / len(questions) for k in k_values}
+    return recall, {"query_p50_ms": latencies[len(latencies) // 2] * 1000, "query_max_ms": latencies[-1] * 1000}
+
+
+def report(result):
+    print(f"\nchunk_tokens={result['chunk_tokens']} overlap={result['chunk_overlap_tokens']}: "
+          f"{result['pages']} pages -> {result['chunks']} chunks of {result['mean_chunk_tokens']:.0f} tokens on average, "
+          f"index {result['index_bytes'] / 1024:.1f} KiB")
+    for name, stage in result["stages"].items():
+        print(f"  {name:<15} {stage['seconds'] * 1000:9.1f} ms  peak rss {stage['peak_rss_mb']:7.1f} MiB")
+    for name in ("dense", "hybrid"):
+        retrieval = result[name]
+        print(f"  {name:<7} query p50 {retrieval['query_p50_ms']:.2f} ms, max {retrieval['query_max_ms']:.2f} ms  "
+              + "  ".join(f"recall@{k}={recall:.2f}" for k, recall in retrieval["recall"].items()))
+    print(f"  hybrid answered {result['hybrid']['lexical_only']:.0%} of the questions lexically")
+    for skipped in result["skipped"]:
+        print(f"  skipped {skipped}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=[settings.CHUNK_TOKENS])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[settings.CHUNK_OVERLAP_TOKENS])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 4])
+    parser.add_argument("--embedding-size", type=int, default=settings.LOCAL_EMBEDDING_SIZE)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--min-recall", type=float, help="exit with status 1 if recall@max(k) falls below this")
+    args = parser.parse_args()
+
+    with open(QUESTIONS) as file:
+        questions = json.load(file)
+    pdf_paths = [os.path.join(ROOT, name) for name in PDFS]
+
+    results = []
+    for chunk_tokens in args.chunk_tokens:
+        for overlap in args.overlaps:
+            if overlap >= chunk_tokens:
+                continue
+            result = run(pdf_paths, questions, chunk_tokens, overlap, args.k, args.embedding_size)
+            report(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.min_recall is not None:
+        worst = min(result["hybrid"]["recall"][max(args.k)] for result in results)
+        if worst < args.min_recall:
+            print(f"\nrecall@{max(args.k)} {worst:.2f} is below {args.min_recall}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import time
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+from metrics import METRICS
+
+
+class StreamingMessageHandler(BaseCallbackHandler):
+    # Pushes LLM tokens into the placeholder of the message being answered.
+    # Re-rendering is throttled: every write resends the whole message so far.
+    def __init__(self, placeholder, render_html, min_interval=0.05):
+        self.placeholder = placeholder
+        self.render_html = render_html
+        self.min_interval = min_interval
+        self.text = ""
+        self._last_render = 0.0
+
+    def on_llm_new_token(self, token, **kwargs):
+        now = time.perf_counter()
+        self.text += token
+        if now - self._last_render >= self.min_interval:
+            self._last_render = now
+            self.render(self.text + "▌")
+
+    def render(self, text):
+        self.placeholder.write(self.render_html(text), unsafe_allow_html=True)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    # Times the LLM calls (condense + answer), the first streamed token and
+    # the retrieval inside a conversation chain run
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self._started = {}
+        self._first_token = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id in self._started and run_id not in self._first_token:
+            self._first_token.add(run_id)
+            self.metrics.observe("query.llm_first_token", time.perf_counter() - self._started[run_id])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish("query.llm", run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish("query.llm_error", run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._finish("query.retrieve", run_id, documents=len(documents))
+
+    def _finish(self, name, run_id, **fields):
+        started = self._started.pop(run_id, None)
+        self._first_token.discard(run_id)
+        if started is not None:
+            self.metrics.observe(name, time.perf_counter() - started, **fields)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    # Prompt and completion tokens of the LLM calls in a chain run. Streamed
+    # completions come back without usage from the API, so their prompts and
+    # generated text are counted with the llm's tokenizer instead.
+    def __init__(self, llm):
+        self.llm = llm
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._prompt_tokens = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._prompt_tokens[run_id] = sum(self.llm.get_num_tokens_from_messages(batch) for batch in messages)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._prompt_tokens[run_id] = sum(self.llm.get_num_tokens(prompt) for prompt in prompts)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens = self._prompt_tokens.pop(run_id, 0)
+        usage = (response.llm_output or {}).get("token_usage")
+        if usage:
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            return
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += sum(self.llm.get_num_tokens(generation.text) for generations in response.generations for generation in generations)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompt_tokens.pop(run_id, None)
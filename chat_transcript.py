@@ -0,0 +1,32 @@
+import html
+
+from htmlTemplates import bot_template, user_template
+
+
+def render_message(role, content):
+    template = user_template if role == "user" else bot_template
+    return template.replace("{{MSG}}", html.escape(content).replace("\n", "<br>"))
+
+
+class ChatTranscript:
+    # Keeps the rendered HTML of every message so a rerun only formats the new
+    # turns, and shows the history a page at a time, newest page first
+    def __init__(self, page_size=20):
+        self.page_size = page_size
+        self.pages_shown = 1
+        self._rendered = []
+
+    def __len__(self):
+        return len(self._rendered)
+
+    def append(self, role, content):
+        self._rendered.append(render_message(role, content))
+
+    def show_more(self):
+        self.pages_shown += 1
+
+    def hidden_count(self):
+        return max(len(self._rendered) - self.pages_shown * self.page_size, 0)
+
+    def visible_html(self):
+        return "".join(self._rendered[self.hidden_count():])
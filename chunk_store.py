@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from incremental_index import text_fingerprint
+from metrics import METRICS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS texts (hash TEXT PRIMARY KEY, text TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS vectors (model TEXT, hash TEXT, vector BLOB NOT NULL, PRIMARY KEY (model, hash));
+CREATE TABLE IF NOT EXISTS files (namespace TEXT, file_hash TEXT, chunks INTEGER NOT NULL, PRIMARY KEY (namespace, file_hash));
+CREATE TABLE IF NOT EXISTS file_chunks (
+    namespace TEXT, file_hash TEXT, position INTEGER, hash TEXT NOT NULL, metadata TEXT NOT NULL,
+    PRIMARY KEY (namespace, file_hash, position)
+);
+"""
+# SQLite limits the number of bound parameters per statement
+_QUERY_BATCH = 500
+
+
+class ChunkStore:
+    # Content-addressed store shared by every agent, session and process:
+    # chunk texts and vectors are keyed by the SHA-256 of the text, and the
+    # chunk list of a PDF by its file hash within a chunking namespace. A PDF
+    # used by several agents is extracted, chunked and embedded once.
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        # sqlite3 connections are per thread; WAL lets readers and a writer overlap
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            self._local.db = db
+        return db
+
+    def vectors(self, model, hashes):
+        hashes = list(hashes)
+        found = {}
+        db = self._db()
+        for start in range(0, len(hashes), _QUERY_BATCH):
+            batch = hashes[start:start + _QUERY_BATCH]
+            rows = db.execute(
+                f"SELECT hash, vector FROM vectors WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                [model, *batch],
+            )
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_vectors(self, model, items):
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO vectors (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, text_hash, np.asarray(vector, dtype=np.float32).tobytes()) for text_hash, vector in items],
+            )
+
+    def file_chunks(self, namespace, file_hash):
+        # [(text, metadata)] of an already chunked PDF, or None
+        db = self._db()
+        if db.execute("SELECT 1 FROM files WHERE namespace = ? AND file_hash = ?", (namespace, file_hash)).fetchone() is None:
+            return None
+        rows = db.execute(
+            "SELECT texts.text, file_chunks.metadata FROM file_chunks JOIN texts ON texts.hash = file_chunks.hash "
+            "WHERE namespace = ? AND file_hash = ? ORDER BY position",
+            (namespace, file_hash),
+        )
+        return [(text, json.loads(metadata)) for text, metadata in rows]
+
+    def put_file_chunks(self, namespace, file_hash, chunks):
+        with self._db() as db:
+            hashes = [text_fingerprint(text) for text, _ in chunks]
+            db.executemany("INSERT OR IGNORE INTO texts (hash, text) VALUES (?, ?)", [(h, text) for h, (text, _) in zip(hashes, chunks)])
+            db.execute("DELETE FROM file_chunks WHERE namespace = ? AND file_hash = ?", (namespace, file_hash))
+            db.executemany(
+                "INSERT INTO file_chunks (namespace, file_hash, position, hash, metadata) VALUES (?, ?, ?, ?, ?)",
+                [(namespace, file_hash, position, h, json.dumps(metadata)) for position, (h, (_, metadata)) in enumerate(zip(hashes, chunks))],
+            )
+            db.execute("INSERT OR REPLACE INTO files (namespace, file_hash, chunks) VALUES (?, ?, ?)", (namespace, file_hash, len(chunks)))
+
+    def stats(self):
+        db = self._db()
+        return {table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("files", "texts", "vectors")}
+
+
+class StoredEmbeddings(Embeddings):
+    # Document vectors come from the store; only texts no agent has embedded
+    # with this model yet reach the wrapped embeddings. Queries pass through.
+    def __init__(self, embeddings, store, model):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = model
+
+    def embed_documents(self, texts):
+        hashes = [text_fingerprint(text) for text in texts]
+        found = self.store.vectors(self.model, set(hashes))
+        missing = {h: text for h, text in zip(hashes, texts) if h not in found}
+        METRICS.count("chunk_store.vector_hits", len(texts) - len(missing))
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.store.put_vectors(self.model, zip(missing, vectors))
+            found.update((h, np.asarray(vector, dtype=np.float32)) for h, vector in zip(missing, vectors))
+            METRICS.count("chunk_store.vector_misses", len(missing))
+        return [found[h].tolist() for h in hashes]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,129 @@
+import itertools
+import re
+from collections import Counter, namedtuple
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_DIGITS = re.compile(r"\d+")
+_LETTER = re.compile(r"[^\W\d_]")
+# "7", "7 / 12", "7 of 12"
+_PAGE_NUMBER = re.compile(r"\d+(\s*(/|of|de)\s*\d+)?")
+
+Sentence = namedtuple("Sentence", ["text", "tokens", "page_no"])
+
+
+def _line_key(line):
+    # "Page 3" and "Page 4" count as the same running header. Other lines
+    # made of numbers only ("2019 - 2021") are content and keep their digits.
+    key = " ".join(line.split()).lower()
+    if _LETTER.search(key) or _PAGE_NUMBER.fullmatch(key):
+        return _DIGITS.sub("#", key)
+    return key
+
+
+def find_boilerplate(pages, edge_lines=2, min_pages=3, min_share=0.5):
+    # Lines that open or close at least half of the pages (and at least
+    # `min_pages` of them) are running headers/footers, not content
+    counts = Counter()
+    for page in pages:
+        lines = [line for line in page.text.splitlines() if line.strip()]
+        counts.update({_line_key(line) for line in lines[:edge_lines] + lines[-edge_lines:]})
+    threshold = max(min_pages, min_share * len(pages))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def iter_sentences(text, boilerplate=frozenset(), seen=None):
+    # Boilerplate lines are kept the first time they appear in `seen` (one
+    # set per file), so a title repeated on every slide still gets indexed once
+    seen = set() if seen is None else seen
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        lines = []
+        for line in paragraph.splitlines():
+            key = _line_key(line)
+            if not key or key in seen:
+                continue
+            if key in boilerplate:
+                seen.add(key)
+            lines.append(line)
+        # PDF line breaks are layout, not structure: unwrap before splitting sentences
+        unwrapped = " ".join(" ".join(lines).split())
+        for sentence in _SENTENCE_END.split(unwrapped):
+            if sentence:
+                yield sentence
+
+
+class TokenChunker:
+    # Packs sentences greedily into chunks of at most `max_tokens`, repeating
+    # up to `overlap_tokens` of trailing sentences at the start of the next
+    # chunk. Each sentence is counted once, so the pass is linear in the text.
+    def __init__(self, count_tokens, max_tokens=300, overlap_tokens=40):
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than max_tokens ({max_tokens})")
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def split_pages(self, pages, lookahead=8):
+        # Chunks may span pages of the same file but never two files; headers
+        # and footers are detected on the first `lookahead` pages of each file
+        for _, file_pages in itertools.groupby(pages, key=lambda page: page.file_hash):
+            head = list(itertools.islice(file_pages, lookahead))
+            boilerplate = find_boilerplate(head)
+            yield from self._split_file(itertools.chain(head, file_pages), boilerplate)
+
+    def _split_file(self, pages, boilerplate):
+        buffer, buffer_tokens, position = [], 0, 0
+        page, seen = None, set()
+        for page in pages:
+            for text in iter_sentences(page.text, boilerplate, seen):
+                for sentence in self._pieces(text, page.page_no):
+                    if buffer and buffer_tokens + sentence.tokens > self.max_tokens:
+                        yield self._chunk(buffer, page, position)
+                        position += 1
+                        buffer, buffer_tokens = self._overlap(buffer, sentence.tokens)
+                    buffer.append(sentence)
+                    buffer_tokens += sentence.tokens
+        # a chunk is only emitted before a new sentence is added, so whatever
+        # is left in the buffer has not been yielded yet
+        if buffer:
+            yield self._chunk(buffer, page, position)
+
+    def _pieces(self, text, page_no):
+        tokens = self.count_tokens(text)
+        if tokens <= self.max_tokens:
+            yield Sentence(text, tokens, page_no)
+            return
+        # a "sentence" longer than a chunk (tables, lists without stops) is cut
+        # at word boundaries
+        words, piece_tokens = [], 0
+        for word in text.split():
+            word_tokens = self.count_tokens(" " + word)
+            if words and piece_tokens + word_tokens > self.max_tokens:
+                yield Sentence(" ".join(words), piece_tokens, page_no)
+                words, piece_tokens = [], 0
+            words.append(word)
+            piece_tokens += word_tokens
+        if words:
+            yield Sentence(" ".join(words), piece_tokens, page_no)
+
+    def _overlap(self, buffer, incoming_tokens):
+        # the repeated sentences and the incoming one must fit in one chunk
+        budget = min(self.overlap_tokens, self.max_tokens - incoming_tokens)
+        kept, kept_tokens = [], 0
+        for sentence in reversed(buffer):
+            if kept_tokens + sentence.tokens > budget:
+                break
+            kept.append(sentence)
+            kept_tokens += sentence.tokens
+        return kept[::-1], kept_tokens
+
+    def _chunk(self, buffer, page, position):
+        metadata = {
+            "source": page.file,
+            "page": buffer[0].page_no,
+            "last_page": buffer[-1].page_no,
+            "file_hash": page.file_hash,
+            "chunk": position,
+            "tokens": sum(sentence.tokens for sentence in buffer),
+        }
+        return " ".join(sentence.text for sentence in buffer), metadata
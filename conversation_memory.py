@@ -0,0 +1,33 @@
+from langchain.memory import (
+    ConversationBufferMemory,
+    ConversationBufferWindowMemory,
+    ConversationSummaryBufferMemory,
+    ConversationTokenBufferMemory,
+)
+
+MEMORY_STRATEGIES = ("buffer", "window", "tokens", "summary")
+
+
+def build_memory(strategy, llm, window_turns=5, max_tokens=1000):
+    # buffer: whole conversation (grows without bound)
+    # window: last `window_turns` question/answer pairs
+    # tokens: newest messages that fit in `max_tokens`
+    # summary: newest messages within `max_tokens`, older ones folded into a running summary
+    common = {"memory_key": "chat_history", "return_messages": True, "input_key": "question", "output_key": "answer"}
+    if strategy == "buffer":
+        return ConversationBufferMemory(**common)
+    if strategy == "window":
+        return ConversationBufferWindowMemory(k=window_turns, **common)
+    if strategy == "tokens":
+        return ConversationTokenBufferMemory(llm=llm, max_token_limit=max_tokens, **common)
+    if strategy == "summary":
+        return ConversationSummaryBufferMemory(llm=llm, max_token_limit=max_tokens, **common)
+    raise ValueError(f"Unknown memory strategy: {strategy}. Expected one of {MEMORY_STRATEGIES}")
+
+
+def history_tokens(memory, llm):
+    # Tokens of chat history that the next question will send to the condense prompt
+    messages = memory.load_memory_variables({})[memory.memory_key]
+    if not messages:
+        return 0
+    return llm.get_num_tokens_from_messages(messages)
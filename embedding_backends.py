@@ -0,0 +1,80 @@
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+import embedding_scheduler
+
+NGRAM_SIZES = (3, 4, 5)
+_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+class HashingEmbeddings(Embeddings):
+    # CPU-only embeddings: character n-grams hashed into `size` buckets with a
+    # sign bit, sublinear TF weighting and L2 normalisation. Stateless, so
+    # queries and documents embed the same way without fitting a vocabulary.
+    def __init__(self, size=768, batch_size=256):
+        self.size = size
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_batch([text])[0].tolist()
+
+    def embed_batch(self, texts):
+        if not texts:
+            return np.zeros((0, self.size), dtype=np.float32)
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            hashes = _text_hashes(text)
+            rows.append(np.full(len(hashes), row, dtype=np.int64))
+            buckets.append((hashes % np.uint64(self.size)).astype(np.int64))
+            signs.append(np.where(hashes >> np.uint64(63), -1.0, 1.0))
+        flat = np.concatenate(rows) * self.size + np.concatenate(buckets)
+        matrix = np.bincount(flat, weights=np.concatenate(signs), minlength=len(texts) * self.size)
+        matrix = matrix.reshape(len(texts), self.size).astype(np.float32)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+def _text_hashes(text):
+    data = np.frombuffer(f" {text.lower()} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    hashes = []
+    for n in NGRAM_SIZES:
+        if len(data) < n:
+            continue
+        windows = np.lib.stride_tricks.sliding_window_view(data, n)
+        # FNV-style polynomial hash over each window, wrapping at 64 bits,
+        # salted with n so the same bytes at different sizes do not collide
+        h = np.full(len(windows), np.uint64(n), dtype=np.uint64)
+        for column in range(n):
+            h = (h ^ windows[:, column]) * _MULTIPLIER
+        hashes.append(h ^ (h >> np.uint64(29)))
+    return np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+
+def embedding_id(backend, model, size):
+    # Part of the index cache key: vectors from different backends never mix
+    if backend == "openai":
+        return f"openai:{model}"
+    return f"{backend}:{size}"
+
+
+def make_embeddings(backend, model, size, api_key=None, **scheduler_kwargs):
+    if backend == "hashing":
+        return HashingEmbeddings(size=size)
+    if backend == "fake":
+        return embedding_scheduler.ScheduledEmbeddings(
+            embedding_scheduler.FakeEmbeddingBackend(size=size, latency=0), **scheduler_kwargs
+        )
+    if backend == "openai":
+        return embedding_scheduler.ScheduledEmbeddings(
+            embedding_scheduler.OpenAIEmbeddingBackend(api_key, model),
+            count_tokens=embedding_scheduler.tiktoken_counter(model),
+            **scheduler_kwargs,
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import random
+import time
+
+import numpy as np
+import openai
+import tiktoken
+from langchain.embeddings.base import Embeddings
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.retry_after = retry_after
+
+
+class OpenAIEmbeddingBackend:
+    def __init__(self, api_key, model):
+        self.api_key = api_key
+        self.model = model
+
+    async def embed_batch(self, texts):
+        try:
+            response = await openai.Embedding.acreate(model=self.model, input=texts, api_key=self.api_key)
+        except openai.error.RateLimitError as error:
+            retry_after = (error.headers or {}).get("retry-after")
+            raise RateLimited(float(retry_after) if retry_after else None) from error
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+
+class FakeEmbeddingBackend:
+    # Offline stand-in for the embeddings API: deterministic vectors, a fixed
+    # latency per request and 429s when more than `capacity` requests overlap
+    def __init__(self, size=1536, latency=0.2, capacity=None):
+        self.size = size
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.requests = 0
+
+    async def embed_batch(self, texts):
+        self.requests += 1
+        if self.capacity is not None and self.in_flight >= self.capacity:
+            await asyncio.sleep(self.latency / 10)
+            raise RateLimited(self.latency)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency)
+            return [self._vector(text) for text in texts]
+        finally:
+            self.in_flight -= 1
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+def approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def tiktoken_counter(model):
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode_ordinary(text))
+
+
+def pack_batches(texts, count_tokens, max_tokens, max_inputs):
+    # Greedy packing in input order; a text larger than max_tokens gets a batch
+    # of its own and is left for the API to truncate or reject
+    batches = []
+    batch, batch_tokens = [], 0
+    for position, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            batches.append((batch, batch_tokens))
+            batch, batch_tokens = [], 0
+        batch.append(position)
+        batch_tokens += tokens
+    if batch:
+        batches.append((batch, batch_tokens))
+    return batches
+
+
+class ThroughputStats:
+    def __init__(self):
+        self.texts = 0
+        self.tokens = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        seconds = self.seconds or 1e-9
+        return {
+            "texts": self.texts,
+            "tokens": self.tokens,
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "texts_per_second": round(self.texts / seconds, 1),
+            "tokens_per_second": round(self.tokens / seconds, 1),
+        }
+
+
+class ScheduledEmbeddings(Embeddings):
+    # Embeds token-bounded batches concurrently, with at most `max_in_flight`
+    # requests open and exponential backoff when the backend rate limits us
+    def __init__(self, backend, count_tokens=approx_tokens, max_batch_tokens=8000, max_batch_inputs=512,
+                 max_in_flight=4, max_retries=6, base_delay=0.5):
+        self.backend = backend
+        self.count_tokens = count_tokens
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.last_stats = ThroughputStats()
+        self.total_stats = ThroughputStats()
+
+    def embed_documents(self, texts):
+        return asyncio.run(self.aembed_documents(texts))
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    async def aembed_documents(self, texts):
+        stats = ThroughputStats()
+        started = time.perf_counter()
+        vectors = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def run(positions, tokens):
+            async with semaphore:
+                batch_vectors = await self._embed_with_retry([texts[p] for p in positions], stats)
+            for position, vector in zip(positions, batch_vectors):
+                vectors[position] = vector
+            stats.batches += 1
+            stats.texts += len(positions)
+            stats.tokens += tokens
+
+        batches = pack_batches(texts, self.count_tokens, self.max_batch_tokens, self.max_batch_inputs)
+        await asyncio.gather(*(run(positions, tokens) for positions, tokens in batches))
+
+        stats.seconds = time.perf_counter() - started
+        self.last_stats = stats
+        for name in ("texts", "tokens", "batches", "retries", "seconds"):
+            setattr(self.total_stats, name, getattr(self.total_stats, name) + getattr(stats, name))
+        return vectors
+
+    async def _embed_with_retry(self, batch, stats):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.backend.embed_batch(batch)
+            except RateLimited as error:
+                if attempt == self.max_retries:
+                    raise
+                stats.retries += 1
+                delay = error.retry_after or self.base_delay * 2 ** attempt
+                await asyncio.sleep(delay * random.uniform(1.0, 1.5))
@@ -0,0 +1,181 @@
+import math
+import time
+
+import faiss
+import numpy as np
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "sq8", "pq")
+# Preference order when INDEX_TYPE is "auto": the first type whose estimated
+# size fits the memory budget wins (flat only for small corpora)
+AUTO_ORDER = ("flat", "hnsw", "sq8", "pq")
+HNSW_NEIGHBORS = 32
+# PQ codebooks have 256 centroids and want ~39 training points per centroid
+PQ_MIN_VECTORS = 256 * 39
+
+
+def index_kind(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return "sq8"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def _nlist(count):
+    # ~4 * sqrt(n) inverted lists, with enough points to train each centroid
+    return max(1, min(int(4 * math.sqrt(count)), count // 39, 65536))
+
+
+def _pq_subquantizers(dimension):
+    for m in (96, 64, 48, 32, 24, 16, 8, 4, 2, 1):
+        if dimension % m == 0 and dimension // m >= 8:
+            return m
+    return 1
+
+
+def factory_string(kind, count, dimension):
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{HNSW_NEIGHBORS}"
+    nlist = _nlist(count)
+    if kind == "ivf":
+        return f"IVF{nlist},Flat"
+    if kind == "sq8":
+        return f"IVF{nlist},SQ8"
+    if kind == "pq":
+        # "np": no polysemous training, which is slow and only helps Hamming search
+        return f"IVF{nlist},PQ{_pq_subquantizers(dimension)}np"
+    raise ValueError(f"Unknown index type: {kind}")
+
+
+def estimate_index_bytes(kind, count, dimension):
+    centroids = _nlist(count) * dimension * 4
+    per_vector = {
+        "flat": dimension * 4,
+        "hnsw": dimension * 4 + HNSW_NEIGHBORS * 2 * 4,
+        "ivf": dimension * 4 + 8,
+        "sq8": dimension + 8,
+        "pq": _pq_subquantizers(dimension) + 8,
+    }[kind]
+    return count * per_vector + (centroids if kind in ("ivf", "sq8", "pq") else 0)
+
+
+def choose_index_type(count, dimension, memory_budget, flat_max_vectors):
+    for kind in AUTO_ORDER:
+        if kind == "flat" and count > flat_max_vectors:
+            continue
+        if kind == "pq" or estimate_index_bytes(kind, count, dimension) <= memory_budget:
+            break
+    return trainable_type(kind, count)
+
+
+def trainable_type(kind, count):
+    # PQ codebooks cannot be trained on fewer points than centroids, and
+    # every non-flat type needs a couple of vectors to train on
+    if kind == "pq" and count < PQ_MIN_VECTORS:
+        kind = "sq8"
+    if kind != "flat" and count < 2:
+        kind = "flat"
+    return kind
+
+
+def all_vectors(index):
+    # IVF vectors are decoded list by list from their stored codes: the shared
+    # index is left untouched, and memory-mapped (on-disk) inverted lists,
+    # which cannot be cloned, are read in place
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return np.ascontiguousarray(index.reconstruct_n(0, index.ntotal), dtype=np.float32)
+    vectors = np.zeros((index.ntotal, index.d), dtype=np.float32)
+    invlists = ivf.invlists
+    coarse_size = ivf.coarse_code_size()
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if not size:
+            continue
+        ids_ptr, codes_ptr = invlists.get_ids(list_no), invlists.get_codes(list_no)
+        ids = faiss.rev_swig_ptr(ids_ptr, size).copy()
+        codes = faiss.rev_swig_ptr(codes_ptr, size * invlists.code_size).reshape(size, invlists.code_size).copy()
+        invlists.release_ids(list_no, ids_ptr)
+        invlists.release_codes(list_no, codes_ptr)
+        # sa_decode wants the list number in front of each code
+        coarse = np.frombuffer(list_no.to_bytes(coarse_size, "little"), dtype=np.uint8)
+        vectors[ids] = ivf.sa_decode(np.hstack([np.tile(coarse, (size, 1)), codes]))
+    return vectors
+
+
+def build_index(kind, vectors, nprobe=16, ef_search=64):
+    count, dimension = vectors.shape
+    index = faiss.index_factory(dimension, factory_string(kind, count, dimension))
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if kind == "hnsw":
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def with_index(vector_store, index):
+    return FAISS(
+        vector_store.embedding_function,
+        index,
+        InMemoryDocstore(dict(vector_store.docstore._dict)),
+        dict(vector_store.index_to_docstore_id),
+        normalize_L2=vector_store._normalize_L2,
+        distance_strategy=vector_store.distance_strategy,
+    )
+
+
+def to_flat(vector_store):
+    # Incremental updates append, reconstruct and delete by position, which
+    # only a flat index supports; compressed stores are expanded back first
+    # (PQ/SQ8 vectors come back with their quantisation error)
+    index = faiss.IndexFlatL2(vector_store.index.d)
+    if vector_store.index.ntotal:
+        index.add(all_vectors(vector_store.index))
+    return with_index(vector_store, index)
+
+
+def compact(vector_store, index_type, memory_budget, flat_max_vectors, nprobe=16, ef_search=64):
+    # Rebuilds a freshly built flat store as the configured index type.
+    # Returns (store, stats) with the build time, size and a probe search time;
+    # stats["requested"] differs from stats["type"] when the corpus was too
+    # small to train the configured type.
+    index = vector_store.index
+    count, dimension = index.ntotal, index.d
+    if index_type == "auto":
+        kind = choose_index_type(count, dimension, memory_budget, flat_max_vectors)
+    else:
+        kind = trainable_type(index_type, count)
+
+    started = time.perf_counter()
+    if kind != index_kind(index):
+        index = build_index(kind, all_vectors(index), nprobe, ef_search)
+        vector_store = with_index(vector_store, index)
+    build_seconds = time.perf_counter() - started
+
+    # search cost depends on the index layout far more than on the query
+    probe = np.random.default_rng(0).standard_normal((16, dimension)).astype(np.float32)
+    started = time.perf_counter()
+    index.search(probe, 4)
+    search_ms = (time.perf_counter() - started) * 1000 / len(probe)
+
+    return vector_store, {
+        "type": kind,
+        "requested": index_type,
+        "vectors": count,
+        "bytes": estimate_index_bytes(kind, count, dimension),
+        "build_seconds": build_seconds,
+        "search_ms": search_ms,
+    }
@@ -0,0 +1,138 @@
+import math
+import sys
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain.schema import BaseRetriever
+
+from answer_cache import normalize_question
+from incremental_index import chunk_id
+from metrics import METRICS
+
+
+def tokenize(text):
+    # same normalisation as cached questions: lowercase, no accents, \w+ words
+    return normalize_question(text).split()
+
+
+class BM25Index:
+    # Inverted index over the chunks of one vector store, built once per
+    # engine: term -> (chunk positions, term frequencies) as numpy arrays
+    def __init__(self, doc_ids, texts, k1=1.5, b=0.75):
+        self.doc_ids = list(doc_ids)
+        self._positions = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for position, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                positions, frequencies = postings[term]
+                positions.append(position)
+                frequencies.append(frequency)
+
+        lengths = np.asarray(lengths, dtype=np.float32)
+        average = lengths.mean() if len(lengths) else 1.0
+        # length normalisation of BM25 is per document, so it is folded in here
+        self._norms = k1 * (1 - b + b * lengths / (average or 1.0))
+        self._k1 = k1
+        count = len(self.doc_ids)
+        # idf of a term no chunk contains, for the coverage of unknown words
+        self._unseen_idf = math.log(1 + (count + 0.5) / 0.5)
+        self.postings = {}
+        for term, (positions, frequencies) in postings.items():
+            idf = math.log(1 + (count - len(positions) + 0.5) / (len(positions) + 0.5))
+            self.postings[term] = (np.asarray(positions, dtype=np.int32), np.asarray(frequencies, dtype=np.float32), idf)
+
+    @classmethod
+    def from_vector_store(cls, vector_store):
+        doc_ids = [vector_store.index_to_docstore_id[i] for i in sorted(vector_store.index_to_docstore_id)]
+        texts = [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        return cls(doc_ids, texts)
+
+    def search(self, query, k):
+        # (doc_id, score) of the k best chunks containing at least one query term
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            positions, frequencies, idf = posting
+            scores[positions] += idf * frequencies * (self._k1 + 1) / (frequencies + self._norms[positions])
+        matched = np.flatnonzero(scores)
+        best = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(self.doc_ids[position], float(scores[position])) for position in best]
+
+    def coverage(self, query, doc_id):
+        # share of the query's idf mass found in the chunk: stopwords weigh
+        # little, words missing from the corpus (e.g. another language) a lot
+        position = self._positions[doc_id]
+        total = matched = 0.0
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                total += self._unseen_idf
+                continue
+            positions, _, idf = posting
+            total += idf
+            found = np.searchsorted(positions, position)
+            if found < len(positions) and positions[found] == position:
+                matched += idf
+        return matched / total if total else 0.0
+
+    def size_bytes(self):
+        size = self._norms.nbytes
+        for term, (positions, frequencies, _) in self.postings.items():
+            size += sys.getsizeof(term) + positions.nbytes + frequencies.nbytes
+        return size
+
+
+class HybridRetriever(BaseRetriever):
+    # BM25 and FAISS over the same chunks, fused with weighted reciprocal rank
+    # fusion. When the best lexical hit clearly beats the runner-up (a project
+    # name, "contact", an e-mail...), covers most of the question's terms and
+    # there are at least k hits, the lexical ranking is returned as is and the
+    # question is never embedded.
+    vector_store: object
+    bm25: BM25Index
+    k: int = 4
+    candidates: int = 20
+    lexical_weight: float = 0.5
+    lexical_margin: float = 1.5
+    lexical_min_coverage: float = 0.5
+    rrf_k: int = 60
+    lexical_only: int = 0
+    hybrid: int = 0
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        lexical = self.bm25.search(query, self.candidates)
+        if self.lexical_margin and self._confident(query, lexical):
+            self.lexical_only += 1
+            METRICS.count("retriever.lexical_only")
+            return [self._document(doc_id) for doc_id, _ in lexical[:self.k]]
+
+        self.hybrid += 1
+        METRICS.count("retriever.hybrid")
+        dense = self.vector_store.similarity_search_with_score(query, k=self.candidates)
+        fused = defaultdict(float)
+        documents = {}
+        for rank, (doc_id, _) in enumerate(lexical):
+            fused[doc_id] += self.lexical_weight / (self.rrf_k + rank + 1)
+        for rank, (document, _) in enumerate(dense):
+            doc_id = chunk_id(document.metadata)
+            documents[doc_id] = document
+            fused[doc_id] += (1 - self.lexical_weight) / (self.rrf_k + rank + 1)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        return [documents.get(doc_id) or self._document(doc_id) for doc_id in ranked]
+
+    def _confident(self, query, lexical):
+        # fewer than k hits would leave the answer short of context
+        if len(lexical) < max(self.k, 2):
+            return False
+        if lexical[0][1] < self.lexical_margin * lexical[1][1]:
+            return False
+        return self.bm25.coverage(query, lexical[0][0]) >= self.lexical_min_coverage
+
+    def _document(self, doc_id):
+        return self.vector_store.docstore.search(doc_id)
+
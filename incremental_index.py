@@ -0,0 +1,107 @@
+import hashlib
+
+import faiss
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+import faiss_indexes
+from index_cache import file_fingerprint, read_pdf_bytes
+
+
+def text_fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(metadata):
+    return f"{metadata['file_hash'][:16]}-{metadata['page']}-{metadata['chunk']}"
+
+
+def indexed_files(vector_store):
+    files = {}
+    for doc_id, doc in vector_store.docstore._dict.items():
+        files.setdefault(doc.metadata.get("file_hash"), []).append(doc_id)
+    return files
+
+
+def unique_pdfs(pdf_list):
+    # Chunk ids are derived from the file hash, so a PDF uploaded twice
+    # (under any name) is only indexed once, at its first position
+    file_hashes = set()
+    unique = []
+    for pdf in pdf_list:
+        file_hash = file_fingerprint(read_pdf_bytes(pdf))
+        if file_hash not in file_hashes:
+            unique.append(pdf)
+        file_hashes.add(file_hash)
+    return unique
+
+
+def plan_update(vector_store, pdf_list):
+    # Returns the chunk ids of files that are gone and the PDFs not indexed yet
+    indexed = indexed_files(vector_store)
+    file_hashes = set()
+    new_pdfs = []
+    for pdf in unique_pdfs(pdf_list):
+        file_hash = file_fingerprint(read_pdf_bytes(pdf))
+        if file_hash not in indexed:
+            new_pdfs.append(pdf)
+        file_hashes.add(file_hash)
+    stale_ids = [doc_id for file_hash, ids in indexed.items() if file_hash not in file_hashes for doc_id in ids]
+    return stale_ids, new_pdfs
+
+
+def clone_vector_store(vector_store):
+    # Engines are shared between sessions, so updates go to a copy
+    if faiss_indexes.index_kind(vector_store.index) != "flat":
+        return faiss_indexes.to_flat(vector_store)
+    return FAISS(
+        vector_store.embedding_function,
+        faiss.clone_index(vector_store.index),
+        InMemoryDocstore(dict(vector_store.docstore._dict)),
+        dict(vector_store.index_to_docstore_id),
+        normalize_L2=vector_store._normalize_L2,
+        distance_strategy=vector_store.distance_strategy,
+    )
+
+
+def apply_update(vector_store, stale_ids, text_chunks, embeddings, batch_size):
+    store = clone_vector_store(vector_store)
+    stats = {"embedded": 0, "reused": 0, "deleted": len(stale_ids)}
+
+    # Chunks whose text is already indexed (e.g. a replaced file that kept most
+    # of its pages) reuse the stored vector instead of being embedded again
+    positions = {doc_id: position for position, doc_id in store.index_to_docstore_id.items()}
+    known = {}
+    for doc_id, doc in store.docstore._dict.items():
+        known.setdefault(text_fingerprint(doc.page_content), positions[doc_id])
+
+    # New vectors are appended before deleting, so the positions above stay valid
+    batch = []
+    for text, metadata in text_chunks:
+        position = known.get(text_fingerprint(text))
+        if position is not None:
+            store.add_embeddings([(text, store.index.reconstruct(position).tolist())], metadatas=[metadata], ids=[chunk_id(metadata)])
+            stats["reused"] += 1
+            continue
+        batch.append((text, metadata))
+        if len(batch) >= batch_size:
+            _embed_batch(store, batch, embeddings)
+            stats["embedded"] += len(batch)
+            batch = []
+    if batch:
+        _embed_batch(store, batch, embeddings)
+        stats["embedded"] += len(batch)
+
+    if stale_ids:
+        store.delete(stale_ids)
+    return store, stats
+
+
+def _embed_batch(store, batch, embeddings):
+    texts = [text for text, _ in batch]
+    vectors = embeddings.embed_documents(texts)
+    store.add_embeddings(
+        list(zip(texts, vectors)),
+        metadatas=[metadata for _, metadata in batch],
+        ids=[chunk_id(metadata) for _, metadata in batch],
+    )
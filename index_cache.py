@@ -0,0 +1,70 @@
+import hashlib
+import os
+import pickle
+import shutil
+import uuid
+
+import faiss
+from langchain.vectorstores import FAISS
+
+import settings
+
+INDEX_NAME = "index"
+# Bumped whenever extraction/chunking changes what ends up in an index
+INDEX_FORMAT_VERSION = 5
+
+
+def read_pdf_bytes(pdf):
+    # The Imanol bot passes a path, user agents pass a streamlit UploadedFile
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, "rb") as file:
+            return file.read()
+    return pdf.getvalue()
+
+
+def file_fingerprint(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def corpus_key(pdf_list, embedding_model, chunk_params, index_type="flat"):
+    # Order matters: chunks are indexed in upload order
+    digest = hashlib.sha256(str(INDEX_FORMAT_VERSION).encode("utf-8"))
+    for pdf in pdf_list:
+        digest.update(file_fingerprint(read_pdf_bytes(pdf)).encode("utf-8"))
+    digest.update(repr(sorted(chunk_params.items())).encode("utf-8"))
+    digest.update(embedding_model.encode("utf-8"))
+    digest.update(index_type.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def index_path(key):
+    return os.path.join(settings.INDEX_CACHE_DIR, key)
+
+
+def load_index(key, embeddings):
+    path = index_path(key)
+    index_file = os.path.join(path, f"{INDEX_NAME}.faiss")
+    if not os.path.exists(index_file):
+        return None
+    try:
+        # Memory-map the index so a cache hit does not copy it into RAM
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        index = faiss.read_index(index_file)
+    with open(os.path.join(path, f"{INDEX_NAME}.pkl"), "rb") as file:
+        docstore, index_to_docstore_id = pickle.load(file)
+    return FAISS(embeddings.embed_query, index, docstore, index_to_docstore_id)
+
+
+def save_index(key, vector_store):
+    path = index_path(key)
+    if os.path.exists(path):
+        return
+    # Write to a temp dir and rename it, so another session never loads
+    # a half-written index
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    vector_store.save_local(tmp_path, INDEX_NAME)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
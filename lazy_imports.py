@@ -0,0 +1,16 @@
+import importlib
+import sys
+import time
+
+# Seconds spent on the first import of each module loaded through timed_import
+IMPORT_TIMES = {}
+
+
+def timed_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - started
+    return module
@@ -1,12 +1,4 @@
 import streamlit as st
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain.chat_models import ChatOpenAI 
-from htmlTemplates import css, bot_template, user_template
 import os
 import subprocess
 from dotenv import load_dotenv  # Importing load_dotenv function
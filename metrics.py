@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import settings
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class Metrics:
+    # Process-wide timings, counters and gauges. Every span is appended to a
+    # JSON-lines event log and the aggregates are rewritten in Prometheus text
+    # format (textfile collector style) at most every `export_interval` seconds.
+    def __init__(self, export_dir=None, export_interval=10.0, window=1000):
+        self.export_dir = export_dir
+        self.export_interval = export_interval
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._totals = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._last_export = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **fields):
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.observe(name, time.perf_counter() - started, **fields)
+
+    def timed_iter(self, name, iterable, **fields):
+        # time spent producing the items of a lazy iterable (e.g. PDF pages),
+        # recorded once it is exhausted
+        seconds = 0.0
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - started
+            yield item
+        self.observe(name, seconds, **fields)
+
+    def observe(self, name, seconds, **fields):
+        with self._lock:
+            self._samples[name].append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+            peak = peak_rss_bytes()
+            if peak is not None:
+                self._gauges["process_peak_rss_bytes"] = peak
+        self._write_event({"time": time.time(), "span": name, "seconds": round(seconds, 6), **fields})
+        self._maybe_export()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def summary(self):
+        with self._lock:
+            spans = {}
+            for name, samples in self._samples.items():
+                ordered = sorted(samples)
+                count, total = self._totals[name]
+                spans[name] = {
+                    "count": count,
+                    "mean": total / count,
+                    "p50": quantile(ordered, 0.5),
+                    "p95": quantile(ordered, 0.95),
+                    "max": ordered[-1],
+                }
+            return {"spans": spans, "counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+    def prometheus_text(self):
+        summary = self.summary()
+        lines = ["# TYPE rag_span_seconds summary"]
+        for name, span in sorted(summary["spans"].items()):
+            for q in ("p50", "p95"):
+                lines.append(f'rag_span_seconds{{span="{name}",quantile="0.{q[1:]}"}} {span[q]:.6f}')
+            lines.append(f'rag_span_seconds_sum{{span="{name}"}} {span["mean"] * span["count"]:.6f}')
+            lines.append(f'rag_span_seconds_count{{span="{name}"}} {span["count"]}')
+        lines.append("# TYPE rag_events_total counter")
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f'rag_events_total{{event="{name}"}} {value}')
+        for name, value in sorted(summary["gauges"].items()):
+            lines.append(f"# TYPE rag_{name} gauge")
+            lines.append(f"rag_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        if not self.export_dir:
+            return
+        os.makedirs(self.export_dir, exist_ok=True)
+        path = os.path.join(self.export_dir, "metrics.prom")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def _maybe_export(self):
+        now = time.monotonic()
+        with self._lock:
+            if not self.export_dir or now - self._last_export < self.export_interval:
+                return
+            self._last_export = now
+        self.export()
+
+    def _write_event(self, event):
+        if not self.export_dir:
+            return
+        os.makedirs(self.export_dir, exist_ok=True)
+        line = json.dumps(event, default=str) + "\n"
+        with self._lock, open(os.path.join(self.export_dir, "events.jsonl"), "a") as file:
+            file.write(line)
+
+
+METRICS = Metrics(settings.METRICS_DIR or None, settings.METRICS_EXPORT_INTERVAL)
@@ -0,0 +1,86 @@
+import hashlib
+import io
+import os
+import uuid
+
+import settings
+
+
+def tesseract_ocr(image_bytes, lang):
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return pytesseract.image_to_string(image, lang=lang)
+
+
+def tesseract_available():
+    try:
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+    except Exception:
+        # pytesseract not installed or the tesseract binary not on PATH
+        return False
+    return True
+
+
+# OCR_BACKEND -> (image bytes, language) -> text, and a check that it can run here
+OCR_ENGINES = {
+    "tesseract": (tesseract_ocr, tesseract_available),
+}
+
+_available = {}
+
+
+def ocr_backend():
+    # The configured backend if it can run in this environment, else None
+    backend = settings.OCR_BACKEND
+    if backend not in OCR_ENGINES:
+        return None
+    if backend not in _available:
+        _available[backend] = OCR_ENGINES[backend][1]()
+    return backend if _available[backend] else None
+
+
+def page_images(reader, page_no):
+    try:
+        return [image.data for image in reader.pages[page_no - 1].images]
+    except Exception:
+        # image filters PyPDF2/Pillow cannot decode (e.g. JBIG2)
+        return []
+
+
+def page_hash(images, backend, lang):
+    # Scans shared between uploads (or re-uploads) are OCR'd once
+    digest = hashlib.sha256(f"{backend}:{lang}".encode("utf-8"))
+    for data in images:
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def ocr_images(images, backend, lang):
+    # Runs in the extraction process pool
+    recognize = OCR_ENGINES[backend][0]
+    return "\n\n".join(recognize(data, lang) for data in images)
+
+
+def cache_path(digest):
+    return os.path.join(settings.OCR_CACHE_DIR, f"{digest}.txt")
+
+
+def read_cached(digest):
+    try:
+        with open(cache_path(digest), encoding="utf-8") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_cached(digest, text):
+    os.makedirs(settings.OCR_CACHE_DIR, exist_ok=True)
+    path = cache_path(digest)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
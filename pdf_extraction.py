@@ -0,0 +1,170 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+import ocr
+import settings
+from index_cache import file_fingerprint, read_pdf_bytes
+from metrics import METRICS
+
+PageRecord = namedtuple("PageRecord", ["file", "page_no", "text", "file_hash"])
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+# (path, reader) of the document a worker process is extracting
+_worker_document = None
+
+
+def get_process_pool():
+    # training threads share one pool; workers are spawned, not forked from
+    # the multi-threaded server process
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def pdf_name(pdf):
+    if isinstance(pdf, (str, os.PathLike)):
+        return os.path.basename(pdf)
+    return pdf.name
+
+
+def extract_page_range(path, start, stop):
+    # Runs in the process pool: tasks only carry the path of the document, each
+    # worker opens it once and keeps it for the following ranges
+    global _worker_document
+    if _worker_document is None or _worker_document[0] != path:
+        with open(path, "rb") as file:
+            _worker_document = (path, PdfReader(io.BytesIO(file.read())))
+    reader = _worker_document[1]
+    return [reader.pages[page_no].extract_text() for page_no in range(start, stop)]
+
+
+def count_pages(pdf_list):
+    return sum(len(PdfReader(io.BytesIO(read_pdf_bytes(pdf))).pages) for pdf in pdf_list)
+
+
+def iter_pdf_pages(pdf_list):
+    # Yields one PageRecord per page, in order, so callers can chunk and embed
+    # without holding the text of the whole upload in memory
+    for pdf in pdf_list:
+        name = pdf_name(pdf)
+        data = read_pdf_bytes(pdf)
+        file_hash = file_fingerprint(data)
+        reader = PdfReader(io.BytesIO(data))
+        yield from _with_ocr(_iter_text_pages(name, data, file_hash, reader), reader)
+
+
+def _iter_text_pages(name, data, file_hash, reader):
+    page_count = len(reader.pages)
+    if page_count < settings.PARALLEL_EXTRACTION_MIN_PAGES or settings.EXTRACTION_WORKERS < 2:
+        for page_no, page in enumerate(reader.pages, start=1):
+            yield PageRecord(name, page_no, page.extract_text(), file_hash)
+    else:
+        for page_no, text in _iter_parallel(data, page_count):
+            yield PageRecord(name, page_no, text, file_hash)
+
+
+def _with_ocr(records, reader):
+    # Pages with (almost) no text layer are scans: their images are OCR'd in
+    # the process pool while the following pages keep being extracted, and
+    # records still come out in page order
+    backend = ocr.ocr_backend()
+    if backend is None:
+        yield from records
+        return
+    pending = deque()
+    max_pending = max(settings.EXTRACTION_WORKERS * 2, 1)
+    for record in records:
+        task = None
+        if len(record.text.strip()) < settings.OCR_MIN_CHARS:
+            task = _start_ocr(reader, record.page_no, backend)
+        pending.append((record, task))
+        while pending and (len(pending) > max_pending or not isinstance(pending[0][1], tuple)):
+            yield _finish_ocr(*pending.popleft())
+    while pending:
+        yield _finish_ocr(*pending.popleft())
+
+
+def _start_ocr(reader, page_no, backend):
+    # None (no images), the cached text, or (page hash, future)
+    images = ocr.page_images(reader, page_no)
+    if not images:
+        return None
+    digest = ocr.page_hash(images, backend, settings.OCR_LANG)
+    cached = ocr.read_cached(digest)
+    if cached is not None:
+        METRICS.count("extract.ocr_cache_hits")
+        return cached
+    if settings.EXTRACTION_WORKERS < 2:
+        future = Future()
+        future.set_result(ocr.ocr_images(images, backend, settings.OCR_LANG))
+    else:
+        future = get_process_pool().submit(ocr.ocr_images, images, backend, settings.OCR_LANG)
+    return digest, future
+
+
+def _finish_ocr(record, task):
+    if task is None:
+        return record
+    if isinstance(task, tuple):
+        digest, future = task
+        text = future.result()
+        ocr.write_cached(digest, text)
+        METRICS.count("extract.ocr_pages")
+    else:
+        text = task
+    # a short text layer (a slide title) is kept, the OCR text follows it
+    return record._replace(text="\n\n".join(part for part in (record.text.strip(), text.strip()) if part))
+
+
+def _iter_parallel(data, page_count):
+    # Page ranges fan out to the pool; at most two ranges per worker are in
+    # flight so memory stays bounded while results come back in page order.
+    # The document is written once to a temp file instead of being sent with
+    # every range.
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        yield from _iter_ranges(path, page_count)
+    finally:
+        os.remove(path)
+
+
+def _iter_ranges(path, page_count):
+    pool = get_process_pool()
+    step = settings.EXTRACTION_PAGES_PER_TASK
+    ranges = iter(range(0, page_count, step))
+    pending = deque()
+    max_pending = settings.EXTRACTION_WORKERS * 2
+    for start in ranges:
+        pending.append((start, pool.submit(extract_page_range, path, start, min(start + step, page_count))))
+        if len(pending) >= max_pending:
+            break
+    try:
+        while pending:
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+            next_start = next(ranges, None)
+            if next_start is not None:
+                pending.append((next_start, pool.submit(extract_page_range, path, next_start, min(next_start + step, page_count))))
+    finally:
+        # the temp file is removed next: do not leave ranges reading it
+        for _, future in pending:
+            future.cancel()
+        for _, future in pending:
+            if not future.cancelled():
+                future.exception()
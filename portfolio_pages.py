@@ -0,0 +1,81 @@
+# Contenido del portafolio como datos: cada pagina es una lista de bloques que
+# main.py sabe renderizar. Un bloque (o una columna dentro de "columns") puede
+# tener "heading", "image" (fichero, ancho), "alert" + "text", "caption",
+# "link" (url, texto) y "download" (PDF servido bajo demanda).
+
+HEADER_IMAGE = ("foto_imanol.jpg", 100)
+
+PAGES = [
+    {
+        "title": "Home",
+        "blocks": [
+            {"alert": "warning", "text": "Imanol Asolo is not your average Full Stack Developer. With a passion for crafting exceptional digital experiences and a knack for driving agile project management, Imanol stands at the intersection of technical prowess and effective leadership. As a certified Scrum Master, he brings a wealth of experience in guiding teams to success through collaboration, innovation, and a relentless pursuit of excellence. Dive into Imanol's portfolio to explore a world where code meets creativity, and where every project is an opportunity to make a meaningful impact."},
+        ],
+    },
+    {
+        "title": "About Imanol Asolo",
+        "blocks": [
+            {"alert": "success", "text": "Meet Imanol Asolo, a passionate Full Stack Developer and dedicated Scrum Master, shaping the digital landscape with innovation and expertise. Beyond the world of coding, Imanol is a devoted husband and proud father, finding balance and inspiration in family life. With a deep love for beach sports and the sea, he brings the same energy and enthusiasm to his work, creating seamless digital experiences that leave a lasting impression. Explore Imanol's portfolio to discover the perfect blend of technical excellence, leadership, and a touch of seaside charm."},
+        ],
+    },
+    {
+        "title": "Skills",
+        "blocks": [
+            {"alert": "info", "text": "Immerse yourself in the world of technology with Imanol Asolo, a seasoned Full Stack Developer and visionary Scrum Master. With a wealth of experience in building robust web applications and leading agile development teams, Imanol combines technical prowess with strategic leadership to drive projects forward. From crafting elegant frontend interfaces to architecting scalable backend systems, he possesses a diverse skill set that fuels innovation and fosters collaboration. Dive into Imanol's portfolio to witness firsthand the fusion of technical excellence, agile methodologies, and a passion for pushing boundaries in the digital realm."},
+            {"columns": [
+                {"image": ("python_icon.png", 100), "alert": "warning", "text": ":star::star::star::star: phyton"},
+                {"image": ("javascript_icon.png", 100), "alert": "warning", "text": ":star::star::star::star: JavaScript"},
+                {"image": ("unix_logo.png", 100), "alert": "warning", "text": ":star::star::star::star: Bash Scripting"},
+            ]},
+            {"columns": [
+                {"image": ("react_icon.png", 100), "alert": "warning", "text": ":star::star::star::star: React"},
+                {"image": ("django_icon.png", 100), "alert": "warning", "text": ":star::star::star::star: Django"},
+                {"image": ("vuejs_icon.png", 100), "alert": "warning", "text": ":star::star::star: Vue JS"},
+            ]},
+            {"heading": "And more to come..."},
+        ],
+    },
+    {
+        "title": "Projects",
+        "blocks": [
+            {"alert": "warning", "text": "Embark on a journey of digital transformation with Imanol Asolo, a versatile Full Stack Developer and seasoned Scrum Master. Delve into an array of captivating projects that showcase Imanol's expertise in crafting cutting-edge solutions and driving agile development initiatives to success. From dynamic web applications to sophisticated software implementations, each project reflects Imanol's commitment to excellence, creativity, and strategic problem-solving. Explore the intersection of technology and innovation as you navigate through Imanol's project portfolio, where every endeavor represents a testament to his unwavering dedication to pushing the boundaries of possibility in the digital landscape."},
+            {"columns": [
+                {"image": ("raptoreye_logo.png", 100), "caption": "Click the button below to download the Raptor Eye presentation.", "download": "Raptor_Eye_pres.pdf"},
+                {"image": ("AI_medicare_logo.png", 100), "caption": "Click the button below to download the AI Medicare presentation.", "download": "AI_medicare_pres.pdf"},
+                {"image": ("Botarmy_logo.png", 100), "caption": "Click the button below to download the Botarmy-Hub presentation.", "download": "Botarmy_pres.pdf"},
+            ]},
+        ],
+    },
+    {
+        "title": "Contact",
+        "blocks": [
+            {"alert": "success", "text": "Ready to embark on a transformative journey fueled by innovation and expertise? Reach out to Imanol Asolo, a seasoned Full Stack Developer and adept Scrum Master, to explore synergies, spark conversations, and unlock new possibilities in the realm of technology and agile development. Whether you're seeking to kickstart a groundbreaking project, optimize your development processes, or simply exchange insights and ideas, Imanol welcomes the opportunity to connect, collaborate, and co-create value together. Drop a message, schedule a call, or send a carrier pigeon – whatever your preferred mode of communication, Imanol is here to listen, engage, and embark on a shared journey of growth and success. Let's connect and pave the way for innovation!"},
+            {"columns": [
+                {"image": ("mail_icon.png", 80), "link": ("mailto:jjusturi@gmail.com", "Send me a mail")},
+                {"image": ("whatsapp_logo.png", 100), "link": ("https://wa.me/+5930993513082", "Send a whatsapp message")},
+                {"image": ("meeting_icon.png", 100), "link": ("https://buymeacoffee.com/imanolasolo", "Let`s have a coffee and have a consultation about technical issues or Coach & Coffee!")},
+                {"image": ("linkedin_logo.png", 80), "link": ("https://www.linkedin.com/in/imanolasolo/", "Find me on Linkedin!")},
+            ]},
+        ],
+    },
+    {
+        "title": "Chat with Imanol Asolo´s bot",
+        "blocks": [
+            {"link": ("https://imanol-asolo-ai-chat.streamlit.app/", "Chat with Imanol Asolo´s AI")},
+        ],
+    },
+]
+
+
+def iter_blocks(blocks):
+    for block in blocks:
+        yield block
+        yield from iter_blocks(block.get("columns", []))
+
+
+def page_images():
+    # Every (file, width) shown anywhere, so thumbnails can be built up front
+    images = [HEADER_IMAGE]
+    for page in PAGES:
+        images.extend(block["image"] for block in iter_blocks(page["blocks"]) if "image" in block)
+    return images
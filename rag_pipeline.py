@@ -0,0 +1,324 @@
+import warnings
+
+import streamlit as st
+from langchain.vectorstores import FAISS
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chat_models import ChatOpenAI 
+import answer_cache
+import chat_streaming
+import chat_transcript
+import chunk_store
+import chunking
+import conversation_memory
+import embedding_backends
+import embedding_scheduler
+import faiss_indexes
+import incremental_index
+import ocr
+import index_cache
+import pdf_extraction
+import retrieval_engine
+import settings
+import training_jobs
+from metrics import METRICS
+
+# Everything that needs langchain, FAISS, PyPDF2 or OpenAI. app.py imports this
+# module only when an agent is trained or asked something.
+
+def get_pdf_pages(pdf_list):
+    # lazily yields (file, page_no, text) records, large PDFs use a process pool
+    return pdf_extraction.iter_pdf_pages(pdf_list)
+
+@st.cache_resource
+def get_token_counter():
+    # chunk limits are in tokens of the embedding model
+    try:
+        return embedding_scheduler.tiktoken_counter(settings.EMBEDDING_MODEL)
+    except Exception as error:
+        # tiktoken downloads its encodings on first use
+        warnings.warn(f"tiktoken unavailable ({error}), chunk sizes are approximated")
+        return embedding_scheduler.approx_tokens
+
+def get_text_chunks(pages):
+    # yields (text, metadata); metadata keeps the first and last page of each chunk
+    chunker = chunking.TokenChunker(get_token_counter(), settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+    return chunker.split_pages(pages)
+
+def get_chunk_params():
+    # scanned pages only have text when OCR could run
+    return {**settings.chunk_params(), "ocr": ocr.ocr_backend() or "none"}
+
+def get_embedding_id():
+    return embedding_backends.embedding_id(settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL, settings.LOCAL_EMBEDDING_SIZE)
+
+def get_corpus_key(pdf_list):
+    # indexes are cached by PDF content + chunking params + OCR backend + embedding backend/model + index type
+    return index_cache.corpus_key(pdf_list, get_embedding_id(), get_chunk_params(), settings.INDEX_TYPE)
+
+@st.cache_resource
+def get_chunk_store():
+    # chunks and vectors shared by all agents: a PDF is only embedded once
+    return chunk_store.ChunkStore(settings.CHUNK_STORE_PATH)
+
+def get_embeddings():
+    # vectors of chunks any agent already embedded come from the chunk store
+    return chunk_store.StoredEmbeddings(get_backend_embeddings(), get_chunk_store(), get_embedding_id())
+
+def get_backend_embeddings():
+    # EMBEDDING_BACKEND=hashing builds indexes locally, without the OpenAI key
+    api_key = st.secrets["OPEN_AI_APIKEY"] if settings.EMBEDDING_BACKEND == "openai" else None
+    return embedding_backends.make_embeddings(
+        settings.EMBEDDING_BACKEND,
+        settings.EMBEDDING_MODEL,
+        settings.LOCAL_EMBEDDING_SIZE,
+        api_key=api_key,
+        max_batch_tokens=settings.EMBEDDING_BATCH_TOKENS,
+        max_batch_inputs=settings.EMBEDDING_BATCH_INPUTS,
+        max_in_flight=settings.EMBEDDING_MAX_IN_FLIGHT,
+        max_retries=settings.EMBEDDING_MAX_RETRIES,
+    )
+
+def track_pages(pages, job):
+    for page in METRICS.timed_iter("train.extract", pages):
+        yield page
+        job.advance()
+
+def get_corpus_chunks(pdf_list, job, stage):
+    # PDFs already chunked for any agent come from the chunk store; the others
+    # are extracted and chunked, then recorded for the next agent using them
+    store = get_chunk_store()
+    namespace = index_cache.file_fingerprint(repr((index_cache.INDEX_FORMAT_VERSION, sorted(get_chunk_params().items()))).encode("utf-8"))
+    files = []
+    for pdf in pdf_list:
+        file_hash = index_cache.file_fingerprint(index_cache.read_pdf_bytes(pdf))
+        files.append((pdf, file_hash, store.file_chunks(namespace, file_hash)))
+    job.stage(stage, pdf_extraction.count_pages([pdf for pdf, _, stored in files if stored is None]))
+
+    for pdf, file_hash, stored in files:
+        if stored is not None:
+            METRICS.count("chunk_store.file_hits")
+            # the same PDF may have been uploaded under another name
+            name = pdf_extraction.pdf_name(pdf)
+            for text, metadata in stored:
+                yield text, {**metadata, "source": name}
+            continue
+        chunks = []
+        for text_chunk in get_text_chunks(track_pages(get_pdf_pages([pdf]), job)):
+            chunks.append(text_chunk)
+            yield text_chunk
+        store.put_file_chunks(namespace, file_hash, chunks)
+
+def get_vector_store(pdf_list, key, job, base_store=None):
+    # runs on a training thread: progress and messages go to the job, not to st
+    embeddings = get_embeddings()
+    job.stage("load cached index")
+    with METRICS.span("train.load_cache"):
+        vectorstore = index_cache.load_index(key, embeddings)
+    if vectorstore is not None:
+        return vectorstore
+
+    if base_store is not None:
+        # retraining after the PDF list changed: only the delta is embedded
+        job.stage("compare with the current index")
+        stale_ids, new_pdfs = incremental_index.plan_update(base_store, pdf_list)
+        text_chunks = get_corpus_chunks(new_pdfs, job, "read and embed new PDFs")
+        with METRICS.span("train.update") as fields:
+            vectorstore, stats = incremental_index.apply_update(base_store, stale_ids, text_chunks, embeddings, settings.INDEX_BATCH_SIZE)
+            fields.update(stats)
+        count_embedding_tokens(embeddings)
+        job.note(f"Embedded {stats['embedded']} new chunks, reused {stats['reused']}, removed {stats['deleted']}")
+        if not vectorstore.index_to_docstore_id:
+            job.note(no_text_message(), "warning")
+            return None
+        vectorstore = compact_vector_store(vectorstore, job)
+        save_vector_store(key, vectorstore, job)
+        return vectorstore
+
+    batch = []
+    # embed in batches while the PDFs are still being extracted
+    for text_chunk in get_corpus_chunks(pdf_list, job, "read and embed PDFs"):
+        batch.append(text_chunk)
+        if len(batch) >= settings.INDEX_BATCH_SIZE:
+            vectorstore = add_to_vector_store(vectorstore, batch, embeddings)
+            batch = []
+    if batch:
+        vectorstore = add_to_vector_store(vectorstore, batch, embeddings)
+    if vectorstore is None:
+        job.note(no_text_message(), "warning")
+        return None
+    vectorstore = compact_vector_store(vectorstore, job)
+    save_vector_store(key, vectorstore, job)
+    count_embedding_tokens(embeddings)
+    if isinstance(embeddings.embeddings, embedding_scheduler.ScheduledEmbeddings) and embeddings.embeddings.total_stats.texts:
+        job.note("Embedding throughput: {texts_per_second} chunks/s, {tokens_per_second} tokens/s ({retries} retries)".format(**embeddings.embeddings.total_stats.as_dict()))
+    return vectorstore
+
+def no_text_message():
+    if ocr.ocr_backend() is None:
+        return "Please upload the textual PDF file - this is PDF files of image (install Tesseract and pytesseract to index scanned PDFs)"
+    return "No text found in the PDF files, not even with OCR"
+
+def save_vector_store(key, vectorstore, job):
+    job.stage("save")
+    with METRICS.span("train.save"):
+        index_cache.save_index(key, vectorstore)
+
+def count_embedding_tokens(embeddings):
+    backend = embeddings.embeddings
+    if isinstance(backend, embedding_scheduler.ScheduledEmbeddings):
+        METRICS.count("embedding.tokens", backend.total_stats.tokens)
+        METRICS.count("embedding.retries", backend.total_stats.retries)
+
+def compact_vector_store(vectorstore, job):
+    job.stage("build index")
+    # stores are built flat, then rebuilt as IVF/HNSW/SQ8/PQ when configured or
+    # when the corpus is too large for a flat index
+    with METRICS.span("train.build_index") as fields:
+        vectorstore, stats = faiss_indexes.compact(
+            vectorstore,
+            settings.INDEX_TYPE,
+            settings.ENGINE_MEMORY_BUDGET_MB * 1024 * 1024,
+            settings.INDEX_FLAT_MAX_VECTORS,
+            nprobe=settings.INDEX_NPROBE,
+            ef_search=settings.INDEX_HNSW_EF_SEARCH,
+        )
+        fields.update(type=stats["type"], vectors=stats["vectors"])
+    if stats["requested"] not in ("auto", stats["type"]):
+        job.note(f"{stats['vectors']} vectors are too few to train a {stats['requested']} index, built {stats['type']} instead")
+    job.note("Index: {type}, {vectors} vectors, {mib:.1f} MiB, built in {build_seconds:.2f} s, {search_ms:.2f} ms per search".format(mib=stats["bytes"] / 2**20, **stats))
+    return vectorstore
+
+def add_to_vector_store(vector_store, text_chunks, embeddings):
+    with METRICS.span("train.embed", chunks=len(text_chunks)):
+        return _add_texts(vector_store, text_chunks, embeddings)
+
+def _add_texts(vector_store, text_chunks, embeddings):
+    texts = [text for text, _ in text_chunks]
+    metadatas = [metadata for _, metadata in text_chunks]
+    ids = [incremental_index.chunk_id(metadata) for metadata in metadatas]
+    if vector_store is None:
+        return FAISS.from_texts(texts=texts, embedding=embeddings, metadatas=metadatas, ids=ids)
+    vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+    return vector_store
+
+@st.cache_resource
+def get_engine_registry():
+    # one registry per process: sessions on the same corpus share its index
+    return retrieval_engine.EngineRegistry(settings.ENGINE_MEMORY_BUDGET_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_llm():
+    return ChatOpenAI(openai_api_key=st.secrets["OPEN_AI_APIKEY"])
+
+@st.cache_resource
+def get_answer_cache():
+    # question similarity uses the local hashing embedder: no API call per lookup
+    embeddings = None
+    if settings.ANSWER_CACHE_SIMILARITY > 0:
+        embeddings = embedding_backends.HashingEmbeddings(size=settings.LOCAL_EMBEDDING_SIZE)
+    return answer_cache.AnswerCache(
+        max_entries=settings.ANSWER_CACHE_SIZE,
+        ttl=settings.ANSWER_CACHE_TTL,
+        embeddings=embeddings,
+        threshold=settings.ANSWER_CACHE_SIMILARITY,
+    )
+
+def get_memory():
+    return conversation_memory.build_memory(
+        settings.MEMORY_STRATEGY,
+        get_llm(),
+        window_turns=settings.MEMORY_WINDOW_TURNS,
+        max_tokens=settings.MEMORY_MAX_TOKENS,
+    )
+
+def get_conversation_chain(engine, memory, stream_handler=None):
+    llm = get_llm()
+    if stream_handler is not None:
+        # only the answer is streamed, the question condensing stays on the shared llm
+        llm = ChatOpenAI(openai_api_key=st.secrets["OPEN_AI_APIKEY"], streaming=True, callbacks=[stream_handler])
+    conversation_chain = ConversationalRetrievalChain.from_llm(
+        llm=llm,
+        retriever=engine.retriever,
+        memory=memory,
+        condense_question_llm=get_llm(),
+    )
+    return conversation_chain
+
+def is_standalone_question(user_question, memory, suggested_questions):
+    # follow-ups depend on the conversation, so only first questions and the
+    # suggested ones are answered from the cache
+    if not memory.chat_memory.messages:
+        return True
+    normalized = answer_cache.normalize_question(user_question)
+    return any(normalized == answer_cache.normalize_question(q) for q in suggested_questions)
+
+@st.cache_resource
+def get_training_jobs():
+    # one pool per process; sessions training the same corpus share the job
+    # the lease a job holds only keeps its engine until the sessions attach
+    return training_jobs.JobRegistry(max_workers=settings.TRAINING_WORKERS, release=lambda lease: lease.release())
+
+def start_training(pdf_files, previous_lease):
+    # builds the shared engine in the background, from the cached index or
+    # from the PDFs if no session has loaded this corpus yet
+    pdf_files = incremental_index.unique_pdfs(pdf_files)
+    key = get_corpus_key(pdf_files)
+    # the previously trained index lets a changed PDF list re-embed only the delta
+    base_store = previous_lease.engine.vector_store if previous_lease else None
+    # the job keeps its own lease, so the engine is not evicted before the
+    # sessions waiting for it attach
+    return get_training_jobs().submit(key, lambda job: build_engine(pdf_files, key, job, base_store))
+
+def build_engine(pdf_files, key, job, base_store):
+    with METRICS.span("train.total", files=len(pdf_files or [])):
+        engine_lease = get_engine_registry().acquire(key, lambda: get_vector_store(pdf_files, key, job, base_store))
+    METRICS.gauge("engine_registry_bytes", get_engine_registry().stats()["size_bytes"])
+    return engine_lease
+
+def finish_training(job, previous_lease):
+    # called by each session once the job is done: attaches a lease of its own.
+    # A failed build (or a corpus without text) keeps the previous engine.
+    if job.result is None:
+        get_training_jobs().collect(job)
+        return previous_lease
+    engine_lease = get_engine_registry().acquire(job.key, lambda: index_cache.load_index(job.key, get_embeddings()))
+    get_training_jobs().collect(job)
+    if previous_lease is not None:
+        previous_lease.release()
+    return engine_lease
+
+def abandon_training(job):
+    # the agent waiting on the job was deleted
+    get_training_jobs().collect(job)
+
+def answer_question(engine, memory, user_question, placeholder, standalone):
+    with METRICS.span("query.total") as fields:
+        answer, usage = _answer_question(engine, memory, user_question, placeholder, standalone)
+        fields["cached"] = usage["cached"]
+    METRICS.count("llm.prompt_tokens", usage["prompt_tokens"])
+    METRICS.count("llm.completion_tokens", usage["completion_tokens"])
+    METRICS.gauge("answer_cache_hit_rate", get_answer_cache().stats()["hit_rate"])
+    return answer, usage
+
+def _answer_question(engine, memory, user_question, placeholder, standalone):
+    cache = get_answer_cache()
+    usage = {"history_tokens": conversation_memory.history_tokens(memory, get_llm()), "prompt_tokens": 0, "completion_tokens": 0, "cached": False}
+    with METRICS.span("query.cache_lookup"):
+        answer = cache.get(engine.key, user_question) if standalone else None
+    if answer is not None:
+        usage["cached"] = True
+        memory.save_context({"question": user_question}, {"answer": answer})
+        return answer, usage
+
+    stream_handler = None
+    if settings.STREAM_RESPONSES:
+        stream_handler = chat_streaming.StreamingMessageHandler(placeholder, lambda text: chat_transcript.render_message("bot", text))
+    conversation = get_conversation_chain(engine, memory, stream_handler)
+    # streamed completions report no usage, the handler counts their tokens itself
+    token_usage = chat_streaming.TokenUsageHandler(get_llm())
+    answer = conversation({'question': user_question}, callbacks=[chat_streaming.MetricsCallbackHandler(), token_usage])['answer']
+    usage["prompt_tokens"] = token_usage.prompt_tokens
+    usage["completion_tokens"] = token_usage.completion_tokens
+    if standalone:
+        cache.put(engine.key, user_question, answer)
+    return answer, usage
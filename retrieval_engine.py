@@ -0,0 +1,107 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import faiss_indexes
+import settings
+from hybrid_retrieval import BM25Index, HybridRetriever
+
+
+class RetrievalEngine:
+    # Read-only view over one corpus, shared by every session talking to it
+    def __init__(self, key, vector_store):
+        self.key = key
+        self.vector_store = vector_store
+        self.bm25 = BM25Index.from_vector_store(vector_store)
+        self.retriever = HybridRetriever(
+            vector_store=vector_store,
+            bm25=self.bm25,
+            k=settings.RETRIEVAL_K,
+            lexical_weight=settings.HYBRID_LEXICAL_WEIGHT,
+            lexical_margin=settings.LEXICAL_CONFIDENCE_MARGIN,
+            lexical_min_coverage=settings.LEXICAL_MIN_COVERAGE,
+        )
+        self.size_bytes = estimate_size(vector_store) + self.bm25.size_bytes()
+
+
+def estimate_size(vector_store):
+    index = vector_store.index
+    size = faiss_indexes.estimate_index_bytes(faiss_indexes.index_kind(index), index.ntotal, index.d)
+    for doc in vector_store.docstore._dict.values():
+        size += sys.getsizeof(doc.page_content)
+    return size
+
+
+class EngineLease:
+    # Handle a session keeps in session_state; the engine is released when the
+    # session drops it or when the session state is garbage collected
+    def __init__(self, registry, engine):
+        self.engine = engine
+        self._finalizer = weakref.finalize(self, registry.release, engine.key)
+
+    def release(self):
+        self._finalizer()
+
+
+class EngineRegistry:
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self._engines = OrderedDict()
+        self._refcounts = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, build):
+        engine = self._attach(key)
+        if engine is not None:
+            return EngineLease(self, engine)
+
+        # Only one session builds a given corpus, the others wait and reuse it
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            engine = self._attach(key)
+            if engine is None:
+                vector_store = build()
+                if vector_store is None:
+                    return None
+                engine = RetrievalEngine(key, vector_store)
+                with self._lock:
+                    self._engines[key] = engine
+                    self._refcounts[key] = 1
+                    self._build_locks.pop(key, None)
+                    self._evict()
+        return EngineLease(self, engine)
+
+    def release(self, key):
+        with self._lock:
+            if key in self._refcounts:
+                self._refcounts[key] = max(self._refcounts[key] - 1, 0)
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "engines": len(self._engines),
+                "size_bytes": sum(engine.size_bytes for engine in self._engines.values()),
+                "refcounts": dict(self._refcounts),
+            }
+
+    def _attach(self, key):
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                self._refcounts[key] += 1
+            return engine
+
+    def _evict(self):
+        total = sum(engine.size_bytes for engine in self._engines.values())
+        for key in list(self._engines):
+            if total <= self.memory_budget:
+                break
+            if self._refcounts[key] > 0:
+                continue
+            total -= self._engines.pop(key).size_bytes
+            del self._refcounts[key]
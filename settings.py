@@ -0,0 +1,98 @@
+import os
+
+# RAG pipeline parameters, overridable through environment variables.
+# Chunks are packed from whole sentences up to CHUNK_TOKENS tokens, repeating
+# up to CHUNK_OVERLAP_TOKENS tokens of the previous chunk
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 300))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", 40))
+
+# PDFs with at least this many pages are extracted in a process pool
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.environ.get("PARALLEL_EXTRACTION_MIN_PAGES", 32))
+EXTRACTION_PAGES_PER_TASK = int(os.environ.get("EXTRACTION_PAGES_PER_TASK", 8))
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1))
+
+# Pages with fewer characters than OCR_MIN_CHARS are OCR'd from their images
+# when OCR_BACKEND can run here ("tesseract" needs pytesseract and the
+# tesseract binary; "none" disables OCR). Results are cached per page
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "tesseract")
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_MIN_CHARS = int(os.environ.get("OCR_MIN_CHARS", 20))
+
+# Chunks are embedded and added to the index in batches of this size
+INDEX_BATCH_SIZE = int(os.environ.get("INDEX_BATCH_SIZE", 1024))
+
+# Embedding requests: token-bounded batches sent concurrently, retried on 429
+EMBEDDING_BATCH_TOKENS = int(os.environ.get("EMBEDDING_BATCH_TOKENS", 8000))
+EMBEDDING_BATCH_INPUTS = int(os.environ.get("EMBEDDING_BATCH_INPUTS", 512))
+EMBEDDING_MAX_IN_FLIGHT = int(os.environ.get("EMBEDDING_MAX_IN_FLIGHT", 4))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", 6))
+
+# "openai" (remote), "hashing" (local CPU n-gram hashing) or "fake" (offline stub)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-ada-002")
+# Vector size of the local backends
+LOCAL_EMBEDDING_SIZE = int(os.environ.get("LOCAL_EMBEDDING_SIZE", 768))
+
+# Retrieval: BM25 and FAISS rankings are fused, BM25 weighing HYBRID_LEXICAL_WEIGHT.
+# A BM25 top hit scoring LEXICAL_CONFIDENCE_MARGIN times the runner-up and
+# holding LEXICAL_MIN_COVERAGE of the question's (idf-weighted) terms is
+# answered lexically without embedding the question (0 disables this)
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", 4))
+HYBRID_LEXICAL_WEIGHT = float(os.environ.get("HYBRID_LEXICAL_WEIGHT", 0.5))
+LEXICAL_CONFIDENCE_MARGIN = float(os.environ.get("LEXICAL_CONFIDENCE_MARGIN", 1.5))
+LEXICAL_MIN_COVERAGE = float(os.environ.get("LEXICAL_MIN_COVERAGE", 0.5))
+
+# FAISS index type: flat, ivf, hnsw, sq8, pq, or auto to pick by corpus size:
+# flat up to INDEX_FLAT_MAX_VECTORS, then the fastest type whose estimated
+# size fits ENGINE_MEMORY_BUDGET_MB
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "auto")
+INDEX_FLAT_MAX_VECTORS = int(os.environ.get("INDEX_FLAT_MAX_VECTORS", 20000))
+INDEX_NPROBE = int(os.environ.get("INDEX_NPROBE", 16))
+INDEX_HNSW_EF_SEARCH = int(os.environ.get("INDEX_HNSW_EF_SEARCH", 64))
+
+INDEX_CACHE_DIR = os.environ.get("INDEX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_cache"))
+# Chunks and vectors shared by all agents (see chunk_store.py)
+CHUNK_STORE_PATH = os.environ.get("CHUNK_STORE_PATH", os.path.join(INDEX_CACHE_DIR, "chunks.sqlite3"))
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.join(INDEX_CACHE_DIR, "ocr"))
+
+# Agents are trained on a background thread pool of this size
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", 2))
+# How often a session waiting for a training job refreshes its progress
+TRAINING_POLL_SECONDS = float(os.environ.get("TRAINING_POLL_SECONDS", 1.0))
+
+# Stream answer tokens into the chat as the LLM produces them
+STREAM_RESPONSES = os.environ.get("STREAM_RESPONSES", "1") == "1"
+
+# Conversation memory: buffer, window, tokens or summary (see conversation_memory.py)
+MEMORY_STRATEGY = os.environ.get("MEMORY_STRATEGY", "window")
+MEMORY_WINDOW_TURNS = int(os.environ.get("MEMORY_WINDOW_TURNS", 5))
+MEMORY_MAX_TOKENS = int(os.environ.get("MEMORY_MAX_TOKENS", 1000))
+
+# Number of chat messages shown before "Show earlier messages"
+CHAT_PAGE_SIZE = int(os.environ.get("CHAT_PAGE_SIZE", 20))
+
+# Pipeline metrics: span timings go to METRICS_DIR/events.jsonl and the
+# aggregates to METRICS_DIR/metrics.prom (empty disables the files). The debug
+# panel shows them in the sidebar of app.py
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_EXPORT_INTERVAL = float(os.environ.get("METRICS_EXPORT_INTERVAL", 10))
+DEBUG_PANEL = os.environ.get("DEBUG_PANEL", "0") == "1"
+
+# Answers to repeated questions are served from a process-wide cache. Above 0,
+# ANSWER_CACHE_SIMILARITY also reuses the answer of a question with the same
+# content words and a close (character n-gram) spelling; off by default
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 1024))
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", 24 * 3600))
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0))
+
+# Shared retrieval engines not attached to any session are evicted (LRU)
+# once their estimated size goes over this budget
+ENGINE_MEMORY_BUDGET_MB = int(os.environ.get("ENGINE_MEMORY_BUDGET_MB", 512))
+
+
+def chunk_params():
+    return {
+        "chunker": "sentences",
+        "max_tokens": CHUNK_TOKENS,
+        "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+    }
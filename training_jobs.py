@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Stage:
+    def __init__(self, name, total=None):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def snapshot(self, now):
+        elapsed = (self.finished or now) - self.started
+        fraction = None
+        eta = None
+        if self.finished is not None:
+            fraction = 1.0
+        elif self.total:
+            fraction = min(self.done / self.total, 1.0)
+            if self.done:
+                eta = elapsed / self.done * (self.total - self.done)
+        return {"name": self.name, "done": self.done, "total": self.total, "fraction": fraction,
+                "elapsed": elapsed, "eta": eta, "finished": self.finished is not None}
+
+
+class TrainingJob:
+    # Progress of one background build, written by the worker thread and read
+    # by every session polling it
+    def __init__(self, key):
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.notes = []
+        self.created = time.monotonic()
+        self.finished = None
+        # sessions that submitted this job and have not collected it yet
+        self.waiters = 0
+        self.released = False
+        self._stages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stage(self, name, total=None):
+        # starting a stage finishes the previous one
+        with self._lock:
+            now = time.monotonic()
+            for stage in self._stages.values():
+                if stage.finished is None:
+                    stage.finished = now
+            self._stages[name] = Stage(name, total)
+
+    def advance(self, amount=1):
+        with self._lock:
+            if self._stages:
+                next(reversed(self._stages.values())).done += amount
+
+    def note(self, message, level="info"):
+        with self._lock:
+            self.notes.append((level, message))
+
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            return [stage.snapshot(now) for stage in self._stages.values()]
+
+    def _run(self, build):
+        self.status = "running"
+        status = "failed"
+        try:
+            self.result = build(self)
+            status = "done"
+        except Exception as error:
+            self.error = error
+        finally:
+            with self._lock:
+                self.finished = time.monotonic()
+                for stage in self._stages.values():
+                    if stage.finished is None:
+                        stage.finished = self.finished
+            # set last: done() implies `finished` is there
+            self.status = status
+
+
+class JobRegistry:
+    # Runs builds on a small thread pool. Sessions submitting the same key
+    # while a job is running (or shortly after it succeeded) share that job.
+    # A job's result is handed to `release` (e.g. to drop the engine lease it
+    # holds) once every session waiting on it collected it, or at the latest
+    # `retention` seconds after it finished.
+    def __init__(self, max_workers=2, retention=300, release=None):
+        self.retention = retention
+        self.release = release
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, build):
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is None or job.status == "failed":
+                job = TrainingJob(key)
+                self._jobs[key] = job
+                self._executor.submit(self._run, job, build)
+            job.waiters += 1
+            return job
+
+    def collect(self, job):
+        # a session attached to the job's result, or gave up waiting on it
+        with self._lock:
+            job.waiters -= 1
+            if job.done() and job.waiters <= 0:
+                self._release(job)
+
+    def get(self, key):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(key)
+
+    def active(self):
+        with self._lock:
+            self._prune()
+            return [job for job in self._jobs.values() if not job.done()]
+
+    def prune(self):
+        with self._lock:
+            self._prune()
+
+    def _run(self, job, build):
+        job._run(build)
+        with self._lock:
+            if job.waiters <= 0:
+                self._release(job)
+        # nobody may call the registry again: expire the job on a timer too
+        timer = threading.Timer(self.retention + 1, self.prune)
+        timer.daemon = True
+        timer.start()
+
+    def _release(self, job):
+        if not job.released and job.result is not None and self.release is not None:
+            self.release(job.result)
+        job.released = True
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [key for key, job in self._jobs.items() if job.done() and now - job.finished > self.retention]
+        for key in expired:
+            self._release(self._jobs.pop(key))